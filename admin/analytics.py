@@ -0,0 +1,358 @@
+"""Attendance rates, weekly trends and at-risk students for the deans.
+
+Attendance is read in chunks of plain column tuples (student, course,
+class session, semester, status code, day) into compact NumPy arrays. Grouped
+rates are then bincounts over the group of every record, weekly trends a
+cumulative sum, and the at-risk list a mask, so a report over millions of
+records takes well under a second once the arrays are loaded.
+
+Rates count Present out of Present and Absent; excused records are left
+out, as on the student dashboard. Archived semesters are read from their
+archive files, which already store the status code and Unix seconds.
+
+NumPy is optional: without it `AVAILABLE` is False and the report
+endpoint and command say so.
+"""
+import threading
+import time
+from datetime import date, datetime, timedelta
+from itertools import chain
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from archive import archive_table, archives
+from models import db, AttendanceRecord, Course, Department, Level, Semester, Student, STATUS_CODES
+
+AVAILABLE = np is not None
+
+CHUNK_SIZE = 50000
+# Column 0 of the status counts holds anything unrecognised
+PRESENT, ABSENT, EXCUSED = (STATUS_CODES[status] for status in ('Present', 'Absent', 'Excused'))
+GROUPINGS = {'department': Department, 'level': Level, 'course': Course, 'semester': Semester}
+
+EPOCH = date(1970, 1, 1)
+# Days are counted from 1970-01-01, a Thursday; weeks start on Monday
+WEEK_OFFSET = 3
+UNIX_EPOCH_JULIAN_DAY = 2440587.5
+
+
+def day_number(day):
+    return (day - EPOCH).days
+
+
+def week_start(week):
+    return EPOCH + timedelta(days=int(week) * 7 - WEEK_OFFSET)
+
+
+def _rates(present, absent):
+    """Percentages of present out of present + absent; NaN where both are 0."""
+    counted = present + absent
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counted > 0, present * 100.0 / counted, np.nan)
+
+
+def _percent(value):
+    return None if np.isnan(value) else round(float(value), 1)
+
+
+class AttendanceFrame:
+    """Attendance records as parallel column arrays.
+
+    `student_id`, `course_id`, `session_id` (0 without a class session),
+    `semester_id` and `day` (days since 1970-01-01) are int32 and `status`
+    an int8 code. `semester_id` is the record's own, the key archives are
+    split on, or its course's when it has none. Each student's department
+    and level are kept in arrays indexed by id, so grouping records by
+    them is a gather.
+    """
+
+    def __init__(self, student_id, course_id, session_id, semester_id, status, day,
+                 student_department, student_level, loaded_at=None):
+        self.student_id = student_id
+        self.course_id = course_id
+        self.session_id = session_id
+        self.semester_id = semester_id
+        self.status = status
+        self.day = day
+        self.student_department = student_department
+        self.student_level = student_level
+        self.loaded_at = loaded_at or datetime.utcnow()
+
+    @classmethod
+    def load(cls, chunk_size=CHUNK_SIZE):
+        """Read every attendance record, archived ones included, `chunk_size` rows at a time."""
+        status_code = db.case(
+            *((AttendanceRecord.status == status, code) for status, code in STATUS_CODES.items()),
+            else_=0
+        )
+        # Truncating the Julian day of the timestamp skips the date() call
+        # that reading attendance_date would make for every row
+        day = db.func.coalesce(
+            db.cast(db.func.julianday(AttendanceRecord.timestamp) - UNIX_EPOCH_JULIAN_DAY, db.Integer), 0
+        )
+        live = db.select(
+            AttendanceRecord.student_id,
+            AttendanceRecord.course_id,
+            db.func.coalesce(AttendanceRecord.class_session_id, 0),
+            db.func.coalesce(AttendanceRecord.semester_id, 0),
+            status_code,
+            day,
+        )
+
+        connection = db.session.connection()
+        chunks = [np.empty((0, 6), dtype=np.int32)]
+        for archive in [None, *archives.load().values()]:
+            if archive is None:
+                stmt = live
+            else:
+                archives.attach(connection, [archive])
+                table = archive_table(archive.semester_id)
+                stmt = db.select(
+                    table.c.student_id,
+                    table.c.course_id,
+                    db.func.coalesce(table.c.class_session_id, 0),
+                    db.literal(archive.semester_id, db.Integer),
+                    table.c.status_code,
+                    table.c.ts // 86400,
+                )
+            for partition in connection.execute(stmt.execution_options(yield_per=chunk_size)).partitions():
+                values = chain.from_iterable(partition)
+                chunks.append(np.fromiter(values, dtype=np.int32, count=len(partition) * 6).reshape(-1, 6))
+        columns = np.concatenate(chunks)
+
+        student_department, student_level = _lookup(
+            db.select(Student.id, Student.department_id, Student.level_id), 2
+        )
+        course_id, semester_id = columns[:, 1], columns[:, 3]
+        if not semester_id.all():
+            (course_semester,) = _lookup(db.select(Course.id, Course.semester_id), 1)
+            semester_id = np.where(semester_id == 0, _gather(course_semester, course_id), semester_id)
+        return cls(
+            student_id=np.ascontiguousarray(columns[:, 0]),
+            course_id=np.ascontiguousarray(course_id),
+            session_id=np.ascontiguousarray(columns[:, 2]),
+            semester_id=np.ascontiguousarray(semester_id),
+            status=columns[:, 4].astype(np.int8),
+            day=np.ascontiguousarray(columns[:, 5]),
+            student_department=student_department,
+            student_level=student_level,
+        )
+
+    def __len__(self):
+        return len(self.status)
+
+    def keys(self, by):
+        """The `by` id of every record: 'student', or one of `GROUPINGS`."""
+        if by == 'student':
+            return self.student_id
+        if by == 'course':
+            return self.course_id
+        if by == 'department':
+            return _gather(self.student_department, self.student_id)
+        if by == 'level':
+            return _gather(self.student_level, self.student_id)
+        if by == 'semester':
+            return self.semester_id
+        raise ValueError(f"Can't group attendance by {by!r}")
+
+    def filter(self, department_id=None, level_id=None, course_id=None,
+               semester_id=None, session_id=None, start=None, end=None):
+        """A frame of the records matching every given filter; `start` and `end` are inclusive dates."""
+        mask = np.ones(len(self), dtype=bool)
+        for by, value in (('department', department_id), ('level', level_id),
+                          ('course', course_id), ('semester', semester_id)):
+            if value:
+                mask &= self.keys(by) == value
+        if session_id:
+            mask &= self.session_id == session_id
+        if start:
+            mask &= self.day >= day_number(start)
+        if end:
+            mask &= self.day <= day_number(end)
+        if mask.all():
+            return self
+        return AttendanceFrame(
+            self.student_id[mask], self.course_id[mask], self.session_id[mask],
+            self.semester_id[mask], self.status[mask], self.day[mask],
+            self.student_department, self.student_level,
+            loaded_at=self.loaded_at
+        )
+
+    def counts(self, by):
+        """Return the group ids and an ``(n, 4)`` array of their counts per status code."""
+        groups, inverse = np.unique(self.keys(by), return_inverse=True)
+        counts = np.bincount(inverse * 4 + self.status, minlength=len(groups) * 4)
+        return groups, counts.reshape(-1, 4)
+
+    def rates(self, by):
+        """Attendance per `by` group, best attended first."""
+        groups, counts = self.counts(by)
+        rates = _rates(counts[:, PRESENT], counts[:, ABSENT])
+        order = np.argsort(-np.nan_to_num(rates, nan=-1.0), kind='stable')
+        return [
+            {
+                "id": int(groups[i]) or None,
+                "records": int(counts[i].sum()),
+                "present": int(counts[i, PRESENT]),
+                "absent": int(counts[i, ABSENT]),
+                "excused": int(counts[i, EXCUSED]),
+                "rate": _percent(rates[i]),
+            }
+            for i in order
+        ]
+
+    def weekly(self, window=4):
+        """Rate per week, with the rate over the last `window` weeks alongside.
+
+        Weeks without records are included so the rolling window always
+        spans `window` calendar weeks.
+        """
+        if not len(self):
+            return []
+        window = max(window, 1)
+        weeks = (self.day + WEEK_OFFSET) // 7
+        first = int(weeks.min())
+        offset = weeks - first
+        size = int(offset.max()) + 1
+        present = np.bincount(offset, weights=self.status == PRESENT, minlength=size)
+        absent = np.bincount(offset, weights=self.status == ABSENT, minlength=size)
+
+        def rolling(values):
+            total = np.cumsum(values)
+            total[window:] = total[window:] - total[:-window]
+            return total
+
+        rates = _rates(present, absent)
+        rolling_rates = _rates(rolling(present), rolling(absent))
+        return [
+            {
+                "week_start": week_start(first + i).isoformat(),
+                "present": int(present[i]),
+                "absent": int(absent[i]),
+                "rate": _percent(rates[i]),
+                "rolling_rate": _percent(rolling_rates[i]),
+            }
+            for i in range(size)
+        ]
+
+    def below(self, threshold, min_records=1, limit=None):
+        """Students attending under `threshold` percent, lowest first.
+
+        Students with fewer than `min_records` present or absent records
+        are left out, so one missed class doesn't flag a new student.
+        """
+        students, counts = self.counts('student')
+        present, absent = counts[:, PRESENT], counts[:, ABSENT]
+        rates = _rates(present, absent)
+        at_risk = np.flatnonzero(((present + absent) >= max(min_records, 1)) & (rates < threshold))
+        at_risk = at_risk[np.argsort(rates[at_risk], kind='stable')][:limit]
+        return [
+            {
+                "student_id": int(students[i]),
+                "present": int(present[i]),
+                "absent": int(absent[i]),
+                "rate": _percent(rates[i]),
+            }
+            for i in at_risk
+        ]
+
+
+def _lookup(stmt, width):
+    """Dense arrays indexed by the first column of `stmt`, one per other column; 0 for NULL."""
+    rows = np.array(
+        [tuple(value or 0 for value in row) for row in db.session.execute(stmt)],
+        dtype=np.int32
+    ).reshape(-1, width + 1)
+    size = int(rows[:, 0].max()) + 1 if len(rows) else 1
+    arrays = []
+    for column in range(1, width + 1):
+        array = np.zeros(size, dtype=np.int32)
+        array[rows[:, 0]] = rows[:, column]
+        arrays.append(array)
+    return arrays
+
+
+def _gather(lookup, ids):
+    """`lookup[ids]`, with 0 for ids beyond it (rows added since it was loaded)."""
+    inside = ids < len(lookup)
+    if inside.all():
+        return lookup[ids]
+    return np.where(inside, lookup[np.where(inside, ids, 0)], 0)
+
+
+class FrameCache:
+    """The loaded `AttendanceFrame`, reloaded once it is `ttl` seconds old.
+
+    Loading reads every record, so only one thread loads at a time and the
+    others wait for its result. Reports lag new attendance by up to `ttl`.
+    """
+
+    def __init__(self, ttl=600):
+        self.ttl = ttl
+        self._loaded = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        loaded = self._loaded
+        if loaded is not None and loaded[0] > time.monotonic():
+            return loaded[1]
+        with self._lock:
+            loaded = self._loaded
+            if loaded is not None and loaded[0] > time.monotonic():
+                return loaded[1]
+            frame = AttendanceFrame.load()
+            self._loaded = (time.monotonic() + self.ttl, frame)
+            return frame
+
+
+frame_cache = FrameCache()
+
+
+def names(model, ids):
+    """``{id: name}`` for the given rows of `model`, in one query."""
+    ids = [i for i in ids if i]
+    if not ids:
+        return {}
+    return dict(db.session.execute(db.select(model.id, model.name).where(model.id.in_(ids))).all())
+
+
+def attendance_report(frame, by='department', threshold=75.0, min_records=5, window=4, limit=100,
+                      **filters):
+    """Grouped rates, weekly trend and at-risk students of `frame`, as JSON-ready dicts.
+
+    `filters` are passed to `AttendanceFrame.filter`.
+    """
+    if by not in GROUPINGS:
+        raise ValueError(f"Can't group attendance by {by!r}")
+    frame = frame.filter(**filters)
+
+    groups = frame.rates(by)
+    labels = names(GROUPINGS[by], [group['id'] for group in groups])
+    for group in groups:
+        group['name'] = labels.get(group['id'])
+
+    at_risk = frame.below(threshold, min_records, limit)
+    students = {}
+    if at_risk:
+        students = {
+            student_id: (name, number)
+            for student_id, name, number in db.session.execute(
+                db.select(Student.id, Student.name, Student.student_number)
+                .where(Student.id.in_([entry['student_id'] for entry in at_risk]))
+            )
+        }
+    for entry in at_risk:
+        entry['name'], entry['student_number'] = students.get(entry['student_id'], (None, None))
+
+    return {
+        "records": len(frame),
+        "loaded_at": frame.loaded_at.isoformat(),
+        "by": by,
+        "threshold": threshold,
+        "groups": groups,
+        "weekly": frame.weekly(window),
+        "at_risk": at_risk,
+    }
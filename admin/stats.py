@@ -0,0 +1,82 @@
+import threading
+import time
+from datetime import date
+
+from flask import Blueprint, abort, current_app, request
+from flask_login import login_required, current_user
+
+from database import read_only
+from models import db, dashboard_counts, reconcile_counters
+from .analytics import AVAILABLE, GROUPINGS, attendance_report, frame_cache
+
+admin_stats_bp = Blueprint('admin_stats', __name__, url_prefix='/admin/stats')
+
+
+def start_counter_reconciliation(app, interval):
+    """Recount the dashboard counters every `interval` seconds on a daemon thread.
+
+    The counters are kept current by flush events, so this only corrects
+    drift from writes that bypass them (raw SQL, other tools). Returns the
+    thread, or None when `interval` is 0.
+    """
+    if interval <= 0:
+        return None
+
+    def run():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    reconcile_counters()
+                except Exception as exc:
+                    db.session.rollback()
+                    print(f"⚠️ Dashboard counter reconciliation failed: {exc}")
+
+    thread = threading.Thread(target=run, name='counter-reconciliation', daemon=True)
+    thread.start()
+    return thread
+
+
+@admin_stats_bp.route('')
+@login_required
+@read_only
+def dashboard_stats():
+    if current_user.role != 'admin':
+        abort(403)
+    return dashboard_counts()
+
+
+@admin_stats_bp.route('/attendance')
+@login_required
+@read_only
+def attendance_analytics():
+    """Attendance rates per group, the weekly trend and at-risk students.
+
+    Takes ``by`` (department, level, course or semester), the filters
+    ``department``, ``level``, ``course``, ``semester``, ``start`` and
+    ``end``, and ``threshold``, ``min_records``, ``window`` (weeks) and
+    ``limit`` for the trend and at-risk list.
+    """
+    if current_user.role != 'admin':
+        abort(403)
+    if not AVAILABLE:
+        return {"error": "Attendance analytics need NumPy installed."}, 503
+    by = request.args.get('by', 'department')
+    if by not in GROUPINGS:
+        abort(400)
+
+    config = current_app.config
+    return attendance_report(
+        frame_cache.get(),
+        by=by,
+        threshold=request.args.get('threshold', config['ANALYTICS_AT_RISK_PERCENT'], type=float),
+        min_records=request.args.get('min_records', config['ANALYTICS_MIN_RECORDS'], type=int),
+        window=request.args.get('window', 4, type=int),
+        limit=request.args.get('limit', 100, type=int),
+        department_id=request.args.get('department', type=int),
+        level_id=request.args.get('level', type=int),
+        course_id=request.args.get('course', type=int),
+        semester_id=request.args.get('semester', type=int),
+        start=request.args.get('start', type=date.fromisoformat),
+        end=request.args.get('end', type=date.fromisoformat),
+    )
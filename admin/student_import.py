@@ -0,0 +1,272 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+from itertools import islice
+
+from email_validator import validate_email, EmailNotValidError
+from flask import Blueprint, current_app, request, abort, url_for
+from flask_login import login_required, current_user
+from sqlalchemy.exc import IntegrityError
+
+from models import db, User, Student, Level, Faculty, Department, StudentImportJob, adjust_counters
+from user.passwords import PasswordVerifier
+
+student_import_bp = Blueprint('student_import', __name__, url_prefix='/admin/students/import')
+
+CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+COLUMNS = ('name', 'email', 'password', 'student_number', 'level_id', 'faculty_id', 'department_id')
+
+# Separate from the login verifier so an import never delays sign-ins
+import_hasher = PasswordVerifier()
+
+
+def start_import(upload, created_by_id=None):
+    """Queue `upload` (a Werkzeug FileStorage) for import and return the job.
+
+    The upload is copied to a temporary file in fixed-size chunks, because
+    the request's own file is closed once the response is sent; the rows
+    are then processed on a background thread.
+    """
+    handle, path = tempfile.mkstemp(suffix='.csv')
+    with os.fdopen(handle, 'wb') as target:
+        shutil.copyfileobj(upload.stream, target)
+
+    job = StudentImportJob(filename=upload.filename, created_by_id=created_by_id)
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    threading.Thread(target=run_import, args=(app, job.id, path), daemon=True).start()
+    return job
+
+
+def run_import(app, job_id, path):
+    with app.app_context():
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as csv_file:
+                import_rows(job_id, csv.DictReader(csv_file))
+        except Exception as exc:
+            db.session.rollback()
+            _update_job(job_id, status='failed', finished_at=datetime.utcnow(),
+                        errors=json.dumps([{'line': None, 'error': str(exc)}]))
+            raise
+        finally:
+            os.remove(path)
+
+
+def import_rows(job_id, reader):
+    missing = [column for column in COLUMNS if column not in (reader.fieldnames or ())]
+    if missing:
+        _update_job(job_id, status='failed', finished_at=datetime.utcnow(),
+                    errors=json.dumps([{'line': 1, 'error': f"Missing columns: {', '.join(missing)}"}]))
+        return
+
+    refs = {
+        'levels': set(db.session.scalars(db.select(Level.id))),
+        'faculties': set(db.session.scalars(db.select(Faculty.id))),
+        'departments': dict(db.session.execute(db.select(Department.id, Department.faculty_id)).all()),
+        'emails': set(),
+        'numbers': set(),
+    }
+    _update_job(job_id, status='running')
+
+    processed = imported = failed = 0
+    errors = []
+    # DictReader counts physical lines, so reader.line_num is the CSV line of each row
+    numbered = ((reader.line_num, row) for row in reader)
+    while True:
+        chunk = list(islice(numbered, CHUNK_SIZE))
+        if not chunk:
+            break
+        valid, chunk_errors = validate_chunk(chunk, refs)
+        inserted, insert_errors = insert_students(valid)
+        chunk_errors.extend(insert_errors)
+
+        processed += len(chunk)
+        imported += inserted
+        failed += len(chunk_errors)
+        errors.extend(chunk_errors[:MAX_REPORTED_ERRORS - len(errors)])
+        _update_job(job_id, processed_rows=processed, imported_rows=imported,
+                    failed_rows=failed, errors=json.dumps(errors))
+
+    _update_job(job_id, status='finished', finished_at=datetime.utcnow())
+
+
+def validate_chunk(chunk, refs):
+    """Split `chunk` into insertable rows and ``{"line", "error"}`` dicts.
+
+    Uniqueness is checked against the file so far and, with one IN query
+    per column, against the database.
+    """
+    emails = {(row.get('email') or '').strip().lower() for _, row in chunk}
+    numbers = {(row.get('student_number') or '').strip() for _, row in chunk}
+    taken_emails = set(db.session.scalars(
+        db.select(db.func.lower(User.email)).where(db.func.lower(User.email).in_(emails))
+    ))
+    taken_numbers = set(db.session.scalars(
+        db.select(User.login_id).where(User.login_id.in_(numbers))
+    ))
+
+    valid, errors = [], []
+    for line, row in chunk:
+        values = {column: (row.get(column) or '').strip() for column in COLUMNS}
+        try:
+            empty = [column for column in COLUMNS if not values[column]]
+            if empty:
+                raise ValueError(f"Missing {', '.join(empty)}")
+            try:
+                email = validate_email(values['email'], check_deliverability=False).normalized
+            except EmailNotValidError as exc:
+                raise ValueError(f"Invalid email: {exc}") from None
+            try:
+                level_id, faculty_id, department_id = (
+                    int(values[column]) for column in ('level_id', 'faculty_id', 'department_id')
+                )
+            except ValueError:
+                raise ValueError("level_id, faculty_id and department_id must be numbers") from None
+
+            if level_id not in refs['levels']:
+                raise ValueError(f"Unknown level_id {level_id}")
+            if faculty_id not in refs['faculties']:
+                raise ValueError(f"Unknown faculty_id {faculty_id}")
+            if department_id not in refs['departments']:
+                raise ValueError(f"Unknown department_id {department_id}")
+            if refs['departments'][department_id] != faculty_id:
+                raise ValueError(f"Department {department_id} is not in faculty {faculty_id}")
+            if email.lower() in taken_emails or email.lower() in refs['emails']:
+                raise ValueError(f"Email {email} is already in use")
+            number = values['student_number']
+            if number in taken_numbers or number in refs['numbers']:
+                raise ValueError(f"Student number {number} is already in use")
+        except ValueError as exc:
+            errors.append({'line': line, 'error': str(exc)})
+            continue
+
+        refs['emails'].add(email.lower())
+        refs['numbers'].add(number)
+        valid.append({
+            'line': line,
+            'name': values['name'],
+            'email': email,
+            'password': values['password'],
+            'student_number': number,
+            'level_id': level_id,
+            'faculty_id': faculty_id,
+            'department_id': department_id,
+        })
+    return valid, errors
+
+
+def insert_students(rows):
+    """Insert validated rows into `user` and `student` with one executemany each.
+
+    If the batch hits a constraint (a concurrent import, say), it is
+    retried row by row so only the offending rows are reported.
+    """
+    if not rows:
+        return 0, []
+
+    hashes = import_hasher.hash_many([row['password'] for row in rows])
+    for row, pwhash in zip(rows, hashes):
+        row['pwhash'] = pwhash
+
+    try:
+        _insert_batch(rows)
+        db.session.commit()
+        return len(rows), []
+    except IntegrityError:
+        db.session.rollback()
+
+    inserted, errors = 0, []
+    for row in rows:
+        try:
+            _insert_batch([row])
+            db.session.commit()
+            inserted += 1
+        except IntegrityError as exc:
+            db.session.rollback()
+            errors.append({'line': row['line'], 'error': str(exc.orig)})
+    return inserted, errors
+
+
+def _insert_batch(rows):
+    users = User.__table__
+    user_ids = db.session.execute(
+        db.insert(users).returning(users.c.id, sort_by_parameter_order=True),
+        [
+            {
+                'email': row['email'],
+                'password': row['pwhash'],
+                'name': row['name'],
+                'role': 'student',
+                'type': 'student',
+                'login_id': row['student_number'],
+            }
+            for row in rows
+        ]
+    ).scalars().all()
+    db.session.execute(db.insert(Student.__table__), [
+        {
+            'id': user_id,
+            'student_number': row['student_number'],
+            'level_id': row['level_id'],
+            'faculty_id': row['faculty_id'],
+            'department_id': row['department_id'],
+        }
+        for user_id, row in zip(user_ids, rows)
+    ])
+    # Core inserts skip the ORM flush that keeps the dashboard counters current
+    adjust_counters(db.session.connection(), {'students': len(user_ids)})
+
+
+def _update_job(job_id, **values):
+    db.session.execute(
+        db.update(StudentImportJob).where(StudentImportJob.id == job_id).values(**values)
+    )
+    db.session.commit()
+
+
+def serialize_job(job):
+    return {
+        "id": job.id,
+        "filename": job.filename,
+        "status": job.status,
+        "processed_rows": job.processed_rows,
+        "imported_rows": job.imported_rows,
+        "failed_rows": job.failed_rows,
+        "errors": json.loads(job.errors),
+        "created_at": job.created_at.isoformat(),
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
+
+
+@student_import_bp.route('', methods=['POST'])
+@login_required
+def create_import():
+    if current_user.role != 'admin':
+        abort(403)
+    upload = request.files.get('csv_file')
+    if upload is None or not upload.filename:
+        abort(400)
+
+    job = start_import(upload, created_by_id=current_user.id)
+    return {
+        "job_id": job.id,
+        "status_url": url_for('student_import.import_status', job_id=job.id)
+    }, 202
+
+
+@student_import_bp.route('/<int:job_id>')
+@login_required
+def import_status(job_id):
+    if current_user.role != 'admin':
+        abort(403)
+    job = db.session.get(StudentImportJob, job_id)
+    if job is None:
+        abort(404)
+    return serialize_job(job)
@@ -0,0 +1,359 @@
+"""Semester archives of attendance records.
+
+Attendance records carry their course's semester, and once a semester
+is over `archive_semester` moves its records out of `attendance_record`
+into a SQLite file of their own, one per semester, listed in
+`attendance_archive`. The live table then only holds open semesters.
+
+Archives are compact rather than compressed: stock SQLite can't read
+compressed pages, and a compressed file could neither be memory-mapped
+nor queried in place. Statuses are stored as `STATUS_CODES` and
+timestamps as whole Unix seconds in a WITHOUT ROWID table clustered on
+(student_id, ts, id), the order a student's history is read in, with an
+index for lecturers. The file is vacuumed and made read-only.
+
+Queries reach archives through `attendance_history`, UNION ALLs of the
+live table and the archives that could hold matching rows, each ATTACHed
+read-only and immutable, with mmap on, to the connection that runs it.
+SQLite attaches only a few databases at once, so archives are read
+`MAX_ATTACHED` at a time, one statement per batch.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime, timedelta
+from urllib.parse import quote
+
+from models import (
+    db, AttendanceArchive, AttendanceRecord, Semester, STATUS_CODES, backfill_attendance_semesters
+)
+
+ARCHIVE_FORMAT = 1
+BATCH_SIZE = 20000
+# SQLite attaches at most 10 databases to a connection; leave one for others
+MAX_ATTACHED = 9
+UNIX_EPOCH = datetime(1970, 1, 1)
+
+ARCHIVE_TABLE = """CREATE TABLE attendance_record (
+    student_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    course_id INTEGER NOT NULL,
+    lecturer_id INTEGER NOT NULL,
+    class_session_id INTEGER,
+    status_code INTEGER NOT NULL,
+    PRIMARY KEY (student_id, ts, id)
+) WITHOUT ROWID"""
+ARCHIVE_INDEXES = (
+    "CREATE INDEX ix_archive_lecturer_ts ON attendance_record (lecturer_id, ts)",
+)
+
+Archive = namedtuple('Archive', ['semester_id', 'path', 'first_day', 'last_day', 'records'])
+
+_archive_metadata = db.MetaData()
+_archive_tables_lock = threading.Lock()
+
+
+def unix_seconds(moment):
+    return int((moment - UNIX_EPOCH).total_seconds())
+
+
+def day_start(day):
+    return datetime.combine(day, datetime.min.time())
+
+
+def archive_schema(semester_id):
+    return f'archive_{int(semester_id)}'
+
+
+def archive_table(semester_id):
+    """The archived `attendance_record` table of a semester, as attached by `ArchiveCatalog.attach`."""
+    schema = archive_schema(semester_id)
+    with _archive_tables_lock:
+        table = _archive_metadata.tables.get(f'{schema}.attendance_record')
+        if table is None:
+            table = db.Table(
+                'attendance_record', _archive_metadata,
+                db.Column('student_id', db.Integer),
+                db.Column('ts', db.Integer),
+                db.Column('id', db.Integer),
+                db.Column('course_id', db.Integer),
+                db.Column('lecturer_id', db.Integer),
+                db.Column('class_session_id', db.Integer),
+                db.Column('status_code', db.Integer),
+                schema=schema
+            )
+        return table
+
+
+class ArchiveCatalog:
+    """The archived semesters, read from `attendance_archive` at most every `ttl` seconds.
+
+    `directory` is where the archive files are (ATTENDANCE_ARCHIVE_DIR)
+    and `mmap_size` the bytes of each one SQLite may memory-map.
+    """
+
+    def __init__(self, directory='archive', ttl=300, mmap_size=256 * 1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.mmap_size = mmap_size
+        self.version = 0
+        self._loaded = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._loaded = None
+
+    def load(self):
+        """Return ``{semester_id: Archive}``."""
+        loaded = self._loaded
+        if loaded is not None and loaded[0] > time.monotonic():
+            return loaded[1]
+
+        version = self.version
+        archives = {
+            row.semester_id: Archive(
+                row.semester_id, os.path.join(self.directory, row.filename),
+                row.first_day, row.last_day, row.records
+            )
+            for row in db.session.execute(db.select(
+                AttendanceArchive.semester_id, AttendanceArchive.filename,
+                AttendanceArchive.first_day, AttendanceArchive.last_day, AttendanceArchive.records
+            ))
+        }
+        with self._lock:
+            if self.version == version:
+                self._loaded = (time.monotonic() + self.ttl, archives)
+        return archives
+
+    def matching(self, semester_id=None, start=None, end=None):
+        """Archives that could hold records of `semester_id` between the dates `start` and `end`."""
+        return [
+            archive for archive in self.load().values()
+            if (not semester_id or archive.semester_id == semester_id)
+            and not (start and archive.last_day and archive.last_day < start)
+            and not (end and archive.first_day and archive.first_day > end)
+        ]
+
+    def attach(self, connection, archives):
+        """ATTACH `archives` to `connection`, read-only, unless they already are.
+
+        Attachments stay with the pooled DBAPI connection; when more than
+        `MAX_ATTACHED` would be open the least recently used are detached,
+        so no statement reading them may still be running. Callers attach
+        at most `MAX_ATTACHED` at once, see `attendance_history`.
+        """
+        if len(archives) > MAX_ATTACHED:
+            raise ValueError(f"Can't attach more than {MAX_ATTACHED} archives at once")
+        attached = connection.info.setdefault('attendance_archives', OrderedDict())
+        for archive in archives:
+            if archive.semester_id in attached:
+                attached.move_to_end(archive.semester_id)
+        for archive in archives:
+            if archive.semester_id in attached:
+                continue
+            while len(attached) >= MAX_ATTACHED:
+                stale, _ = attached.popitem(last=False)
+                connection.exec_driver_sql(f"DETACH DATABASE {archive_schema(stale)}")
+            schema = archive_schema(archive.semester_id)
+            uri = f"file:{quote(os.path.abspath(archive.path))}?mode=ro&immutable=1"
+            connection.exec_driver_sql(f"ATTACH DATABASE ? AS {schema}", (uri,))
+            connection.exec_driver_sql(f"PRAGMA {schema}.mmap_size = {int(self.mmap_size)}")
+            attached[archive.semester_id] = schema
+
+
+archives = ArchiveCatalog()
+
+
+def archived_status(table):
+    """Decode an archive's `status_code` back to the status text."""
+    return db.case({code: status for status, code in STATUS_CODES.items()}, value=table.c.status_code)
+
+
+def attendance_history(connection, student_id=None, lecturer_id=None, course_id=None,
+                       semester_id=None, start=None, end=None, class_session_ids=None):
+    """Yield subqueries that together hold the attendance records, archived semesters included.
+
+    Each has the columns id, student_id, course_id, lecturer_id,
+    class_session_id, semester_id, status and timestamp. Every filter is
+    applied inside the live table and each archive so both stay on their
+    indexes, and archives that can't match are left out; `start` and
+    `end` are inclusive dates. Archived timestamps read back in the text
+    form the live column stores, so they compare and sort alike.
+
+    Each subquery reads up to `MAX_ATTACHED` archives, oldest semesters
+    first, and the last one also reads the live table. Its archives are
+    attached to `connection` as it is yielded, detaching earlier ones, so
+    run each statement on `connection` to the end before taking the next.
+    """
+    live = db.select(
+        AttendanceRecord.id, AttendanceRecord.student_id, AttendanceRecord.course_id,
+        AttendanceRecord.lecturer_id, AttendanceRecord.class_session_id, AttendanceRecord.semester_id,
+        AttendanceRecord.status, AttendanceRecord.timestamp
+    )
+    if student_id:
+        live = live.where(AttendanceRecord.student_id == student_id)
+    if lecturer_id:
+        live = live.where(AttendanceRecord.lecturer_id == lecturer_id)
+    if course_id:
+        live = live.where(AttendanceRecord.course_id == course_id)
+    if semester_id:
+        live = live.where(AttendanceRecord.semester_id == semester_id)
+    if class_session_ids is not None:
+        live = live.where(AttendanceRecord.class_session_id.in_(class_session_ids))
+    # The student and lecturer indexes end in timestamp, the others start with the day
+    if start:
+        live = live.where(
+            AttendanceRecord.timestamp >= day_start(start) if student_id or lecturer_id
+            else AttendanceRecord.attendance_date >= start
+        )
+    if end:
+        live = live.where(
+            AttendanceRecord.timestamp < day_start(end + timedelta(days=1)) if student_id or lecturer_id
+            else AttendanceRecord.attendance_date <= end
+        )
+
+    matching = sorted(
+        archives.matching(semester_id, start, end),
+        key=lambda archive: (archive.first_day or date.min, archive.semester_id)
+    )
+    batches = [matching[i:i + MAX_ATTACHED] for i in range(0, len(matching), MAX_ATTACHED)] or [[]]
+    for number, batch in enumerate(batches, start=1):
+        archives.attach(connection, batch)
+        branches = [
+            _archive_branch(archive, student_id, lecturer_id, course_id, start, end, class_session_ids)
+            for archive in batch
+        ]
+        if number == len(batches):
+            branches.append(live)
+        if len(branches) == 1:
+            yield branches[0].subquery('attendance_history')
+        else:
+            yield db.union_all(*branches).subquery('attendance_history')
+
+
+def _archive_branch(archive, student_id, lecturer_id, course_id, start, end, class_session_ids):
+    """Select an archive's records matching the filters, in the columns of the live table."""
+    table = archive_table(archive.semester_id)
+    branch = db.select(
+        table.c.id, table.c.student_id, table.c.course_id, table.c.lecturer_id,
+        table.c.class_session_id, db.literal(archive.semester_id, db.Integer).label('semester_id'),
+        archived_status(table).label('status'),
+        db.type_coerce(
+            db.func.strftime('%Y-%m-%d %H:%M:%S.000000', table.c.ts, 'unixepoch'), db.DateTime
+        ).label('timestamp')
+    )
+    if student_id:
+        branch = branch.where(table.c.student_id == student_id)
+    if lecturer_id:
+        branch = branch.where(table.c.lecturer_id == lecturer_id)
+    if course_id:
+        branch = branch.where(table.c.course_id == course_id)
+    if class_session_ids is not None:
+        branch = branch.where(table.c.class_session_id.in_(class_session_ids))
+    if start:
+        branch = branch.where(table.c.ts >= unix_seconds(day_start(start)))
+    if end:
+        branch = branch.where(table.c.ts < unix_seconds(day_start(end + timedelta(days=1))))
+    return branch
+
+
+def archive_semester(semester_id, directory, min_idle_days=30, force=False):
+    """Move a semester's attendance records into a read-only archive file.
+
+    Refuses semesters already archived, without records, or with a record
+    from the last `min_idle_days` days unless `force` is set. The file is
+    written and checked before any record is deleted, and the records
+    are deleted in the same transaction that lists the archive. Returns
+    the new `AttendanceArchive`.
+    """
+    semester = db.session.get(Semester, semester_id)
+    if semester is None:
+        raise ValueError(f"No semester with id {semester_id}")
+    if db.session.get(AttendanceArchive, semester_id) is not None:
+        raise ValueError(f"{semester.name} is already archived")
+    # Records saved without a semester would otherwise stay behind
+    backfill_attendance_semesters()
+
+    in_semester = AttendanceRecord.semester_id == semester_id
+    count, last_id, first, last = db.session.execute(
+        db.select(
+            db.func.count(AttendanceRecord.id), db.func.max(AttendanceRecord.id),
+            db.func.min(AttendanceRecord.timestamp), db.func.max(AttendanceRecord.timestamp)
+        ).where(in_semester)
+    ).one()
+    if not count:
+        raise ValueError(f"{semester.name} has no attendance records to archive")
+    if not force and last > datetime.utcnow() - timedelta(days=min_idle_days):
+        raise ValueError(f"{semester.name} still has attendance from {last:%Y-%m-%d}; pass force to archive it anyway")
+
+    # Records added while the file is written have higher ids and stay live
+    archived_records = db.and_(in_semester, AttendanceRecord.id <= last_id)
+    status_code = db.case(
+        *((AttendanceRecord.status == status, code) for status, code in STATUS_CODES.items()),
+        else_=0
+    )
+    rows = db.session.connection().execute(
+        db.select(
+            AttendanceRecord.student_id,
+            db.cast(db.func.strftime('%s', AttendanceRecord.timestamp), db.Integer),
+            AttendanceRecord.id,
+            AttendanceRecord.course_id,
+            AttendanceRecord.lecturer_id,
+            AttendanceRecord.class_session_id,
+            status_code
+        ).where(archived_records).order_by(
+            AttendanceRecord.student_id, AttendanceRecord.timestamp, AttendanceRecord.id
+        ).execution_options(yield_per=BATCH_SIZE)
+    )
+
+    os.makedirs(directory, exist_ok=True)
+    filename = f'attendance-semester-{semester_id}.db'
+    path = os.path.join(directory, filename)
+    written = write_archive(path, rows.partitions())
+    if written != count:
+        os.remove(path)
+        raise RuntimeError(f"Archived {written} of {count} records of {semester.name}; nothing was deleted")
+
+    archive = AttendanceArchive(
+        semester_id=semester_id, filename=filename, records=written,
+        first_day=first.date(), last_day=last.date(), size_bytes=os.path.getsize(path)
+    )
+    db.session.add(archive)
+    db.session.execute(
+        db.delete(AttendanceRecord).where(archived_records).execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    archives.invalidate()
+    return archive
+
+
+def write_archive(path, batches):
+    """Write `batches` of archive rows to a new read-only SQLite file at `path`; return the rows it holds."""
+    partial = path + '.partial'
+    if os.path.exists(partial):
+        os.remove(partial)
+    connection = sqlite3.connect(partial)
+    try:
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.execute(f"PRAGMA user_version = {ARCHIVE_FORMAT}")
+        connection.execute(ARCHIVE_TABLE)
+        for batch in batches:
+            connection.executemany("INSERT INTO attendance_record VALUES (?, ?, ?, ?, ?, ?, ?)", map(tuple, batch))
+        # Indexes are cheaper to build once the rows are in
+        for index in ARCHIVE_INDEXES:
+            connection.execute(index)
+        connection.commit()
+        connection.execute("ANALYZE")
+        connection.execute("VACUUM")
+        stored = connection.execute("SELECT count(*) FROM attendance_record").fetchone()[0]
+    finally:
+        connection.close()
+    os.replace(partial, path)
+    os.chmod(path, 0o444)
+    return stored
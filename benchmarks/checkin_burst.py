@@ -0,0 +1,160 @@
+"""Check that self check-in absorbs a whole class arriving at once.
+
+Seeds a temporary SQLite database with one course of --students enrolled
+students, opens check-in for its class session and has every student
+submit the code from --threads client threads on a single app instance.
+Reports latency percentiles, throughput and the SQL statements issued
+while the burst ran, then waits for the write-behind buffer to save the
+records. Fails if any check-in is rejected, the burst takes longer than
+--deadline seconds or records are missing.
+
+Run from the project root:
+
+    python -m benchmarks.checkin_burst
+    python -m benchmarks.checkin_burst --students 2000 --threads 64
+    python -m benchmarks.checkin_burst --warm-cache
+"""
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask
+from flask_login import LoginManager
+
+from config import config
+from database import init_database
+from models import (
+    db, Faculty, Department, Level, Semester, Lecturer, Student,
+    Course, ClassSession, AttendanceRecord, create_tables
+)
+from profiling import count_statements
+from user.cache import load_user_snapshot
+from user.checkin import checkin_bp, checkin_table, checkin_buffer
+
+
+def build_app(database_uri):
+    app = Flask(__name__)
+    app.config.from_object(config)
+    app.config.update(SQLALCHEMY_DATABASE_URI=database_uri, SECRET_KEY='checkin-burst')
+    init_database(app)
+
+    login_manager = LoginManager(app)
+    login_manager.user_loader(lambda user_id: load_user_snapshot(int(user_id)))
+    app.register_blueprint(checkin_bp)
+    checkin_buffer.start(app)
+    return app
+
+
+def seed(student_count):
+    faculty = Faculty(name='Science')
+    department = Department(name='Physics', faculty=faculty)
+    level = Level(name='ND1')
+    semester = Semester(name='First Semester')
+    lecturer = Lecturer(
+        email='lecturer@example.com', password='-', name='Lecturer', role='lecturer',
+        staff_number='STAFF1', department=department, faculty=faculty
+    )
+    course = Course(name='Mechanics', department=department, lecturer=lecturer, semester=semester)
+    class_session = ClassSession(
+        course_code='PHY101', title='Mechanics', time='Monday 08:00',
+        department=department, level=level, lecturer=lecturer
+    )
+    students = [
+        Student(
+            email=f'student{i}@example.com', password='-', name=f'Student {i}', role='student',
+            student_number=f'STU{i:05d}', department=department, faculty=faculty,
+            level=level, courses=[course]
+        )
+        for i in range(student_count)
+    ]
+    db.session.add_all([faculty, department, level, semester, lecturer, course, class_session, *students])
+    db.session.commit()
+    return lecturer.id, course.id, class_session.id, [student.id for student in students]
+
+
+def percentile(values, pct):
+    rank = math.ceil(pct / 100 * len(values)) - 1
+    return values[min(max(rank, 0), len(values) - 1)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Burst-test the self check-in endpoint.")
+    parser.add_argument('--students', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--deadline', type=float, default=60.0,
+                        help="Seconds the whole class must be checked in within.")
+    parser.add_argument('--warm-cache', action='store_true',
+                        help="Load every student into the user cache first, as after a recent login.")
+    options = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = build_app(f"sqlite:///{os.path.join(directory, 'checkin.db')}")
+        create_tables(app)
+        with app.app_context():
+            lecturer_id, course_id, class_session_id, student_ids = seed(options.students)
+            engine = db.engine
+            if options.warm_cache:
+                for student_id in student_ids:
+                    load_user_snapshot(student_id)
+        window = checkin_table.open(class_session_id, course_id, lecturer_id, student_ids)
+
+        clients = []
+        for student_id in student_ids:
+            client = app.test_client()
+            with client.session_transaction() as session:
+                session['_user_id'] = str(student_id)
+                session['_fresh'] = True
+            clients.append(client)
+
+        def check_in(client):
+            started = time.perf_counter()
+            response = client.post('/check-in', json={'code': window.code})
+            return time.perf_counter() - started, response.status_code
+
+        with count_statements(engine) as counter:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options.threads) as pool:
+                results = list(pool.map(check_in, clients))
+            elapsed = time.perf_counter() - started
+
+        flush_started = time.perf_counter()
+        saved = 0
+        while time.perf_counter() - flush_started < 30:
+            with app.app_context():
+                saved = db.session.scalar(db.select(db.func.count()).select_from(AttendanceRecord))
+            if saved >= len(student_ids) and not checkin_buffer.pending():
+                break
+            time.sleep(0.1)
+        saved_after = time.perf_counter() - flush_started
+        checkin_table.close(class_session_id)
+
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    rejected = sum(1 for _, status in results if status != 202)
+    print(f"check-ins: {len(results)} in {elapsed:.2f}s ({len(results) / elapsed:.0f}/s), "
+          f"{options.threads} threads")
+    print(f"latency ms: p50 {percentile(latencies, 50):.1f}, p95 {percentile(latencies, 95):.1f}, "
+          f"p99 {percentile(latencies, 99):.1f}")
+    print(f"statements during the burst: {counter.count} "
+          f"(user cache misses and buffer flushes; code checks read nothing)")
+    print(f"records saved: {saved}/{len(student_ids)}, {saved_after:.2f}s after the burst")
+
+    failures = []
+    if rejected:
+        failures.append(f"{rejected} check-ins were rejected")
+    if elapsed > options.deadline:
+        failures.append(f"burst took {elapsed:.1f}s, over the {options.deadline:.0f}s deadline")
+    if saved != len(student_ids):
+        failures.append(f"{len(student_ids) - saved} check-ins were not saved")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if not failures:
+        print("ok")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Check that multi-select validation grows linearly with the form.
+
+Validates an `IndexedSelectMultipleField` with --choices choices and
+--selected submitted values, then with the form scaled up 2x, 4x and 8x,
+and prints the median time of each next to WTForms' own
+SelectMultipleField. Growing choices and selections together, linear
+validation takes about 8x as long at the largest size and quadratic
+validation about 64x; fails if ours takes more than --max-growth times
+the linear share.
+
+Run from the project root:
+
+    python -m benchmarks.choice_validation
+    python -m benchmarks.choice_validation --choices 20000 --selected 500
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from werkzeug.datastructures import MultiDict
+from wtforms import Form, SelectMultipleField
+
+from user.forms import IndexedSelectMultipleField
+
+SCALES = (1, 2, 4, 8)
+
+
+def build_form(field_class, choices, selected):
+    class ChoiceForm(Form):
+        students = field_class('Students', coerce=int)
+
+    form = ChoiceForm(formdata=MultiDict(
+        ('students', str(value)) for value in range(0, choices, max(choices // selected, 1))[:selected]
+    ))
+    form.students.choices = [(value, f'Student {value}') for value in range(choices)]
+    return form
+
+
+def measure(field_class, choices, selected, repeat):
+    """Median seconds to validate, and whether the form was valid."""
+    timings, valid = [], False
+    for _ in range(repeat):
+        form = build_form(field_class, choices, selected)
+        started = time.perf_counter()
+        valid = form.validate()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), valid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time multi-select validation as the form grows.")
+    parser.add_argument('--choices', type=int, default=5000, help="Choices at the smallest size.")
+    parser.add_argument('--selected', type=int, default=125, help="Submitted values at the smallest size.")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per size.")
+    parser.add_argument('--max-growth', type=float, default=2.5,
+                        help="How far past linear growth the largest size may go.")
+    options = parser.parse_args(argv)
+
+    failures = []
+    timings = []
+    for scale in SCALES:
+        choices, selected = options.choices * scale, options.selected * scale
+        ours, valid = measure(IndexedSelectMultipleField, choices, selected, options.repeat)
+        stock, _ = measure(SelectMultipleField, choices, selected, options.repeat)
+        timings.append(ours)
+        print(f"{choices} choices x {selected} selected: {ours * 1000:.2f}ms (WTForms {stock * 1000:.2f}ms)")
+        if not valid:
+            failures.append(f"{choices} choices x {selected} selected did not validate")
+
+    growth = timings[-1] / max(timings[0], 1e-9)
+    print(f"\n{SCALES[-1]}x the form took {growth:.1f}x as long")
+    if growth > SCALES[-1] * options.max_growth:
+        failures.append(f"validation grew {growth:.1f}x for a {SCALES[-1]}x larger form")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if not failures:
+        print("ok")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
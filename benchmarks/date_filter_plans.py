@@ -0,0 +1,141 @@
+"""Show how attendance date filters are planned on a million-row table.
+
+Builds a temporary synthetic database with about --rows attendance
+records, then runs each filter the old way, wrapping the timestamp in
+``date()``, and the current way, with a half-open timestamp range or the
+generated ``attendance_date`` column. For both it prints SQLite's query
+plan, the median time over --repeat runs and the rows matched. Fails if a
+current query still scans the whole table or matches different rows.
+
+Run from the project root:
+
+    python -m benchmarks.date_filter_plans
+    python -m benchmarks.date_filter_plans --rows 200000 --repeat 3
+"""
+import argparse
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from sqlalchemy import event
+
+from benchmarks.synthetic import build_app, generate
+from models import db, AttendanceRecord, create_tables
+from user.queries import lecturer_attendance_queries, student_attendance_queries
+
+COURSES_PER_GROUP = 6
+WEEKS = 12
+FULL_SCAN = 'SCAN attendance_record'
+
+
+def build_database(path, rows):
+    students = math.ceil(rows / (COURSES_PER_GROUP * WEEKS))
+    app = build_app(f'sqlite:///{path}')
+    create_tables(app)
+    with app.app_context():
+        counts = generate(SimpleNamespace(
+            faculties=5, departments_per_faculty=4, lecturers=200, students=students,
+            courses_per_group=COURSES_PER_GROUP, weeks=WEEKS, password='password', seed=1
+        ))
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+    return app, counts['attendance_record']
+
+
+@contextmanager
+def captured_statements(engine):
+    seen = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        seen.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        yield seen
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+
+
+def measure(connection, query, repeat):
+    """Return the plan, median seconds and row count of an ORM query or Core select."""
+    stmt = getattr(query, 'statement', query)
+    with captured_statements(connection.engine) as seen:
+        rows = len(connection.execute(stmt).all())
+    sql, parameters = seen[-1]
+    plan = [row[-1] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}', parameters)]
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        connection.execute(stmt).all()
+        timings.append(time.perf_counter() - started)
+    return plan, statistics.median(timings), rows
+
+
+def build_cases():
+    """(name, old, current) queries around a record in the middle of the table."""
+    record = db.session.scalars(
+        db.select(AttendanceRecord).order_by(AttendanceRecord.id).offset(
+            db.session.scalar(db.select(db.func.count(AttendanceRecord.id))) // 2
+        ).limit(1)
+    ).one()
+    day = record.timestamp.date()
+    old_day = db.func.date(AttendanceRecord.timestamp) == day.isoformat()
+
+    return [
+        ("lecturer, one day",
+         AttendanceRecord.query.filter(AttendanceRecord.lecturer_id == record.lecturer_id, old_day),
+         next(lecturer_attendance_queries(record.lecturer_id, date=day))),
+        ("student, one day",
+         AttendanceRecord.query.filter(AttendanceRecord.student_id == record.student_id, old_day),
+         next(student_attendance_queries(record.student_id, date=day))),
+        ("course, one day",
+         AttendanceRecord.query.filter(AttendanceRecord.course_id == record.course_id, old_day),
+         AttendanceRecord.query.filter(
+             AttendanceRecord.attendance_date == day, AttendanceRecord.course_id == record.course_id)),
+        ("everyone, one day",
+         AttendanceRecord.query.filter(old_day),
+         AttendanceRecord.query.filter(AttendanceRecord.attendance_date == day)),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare date filter query plans.")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Attendance records to generate.")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per query.")
+    options = parser.parse_args(argv)
+
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        app, rows = build_database(os.path.join(directory, 'plans.db'), options.rows)
+        print(f"Built {rows} attendance records in {time.perf_counter() - started:.1f}s\n")
+
+        with app.app_context():
+            connection = db.session.connection()
+            for name, old, new in build_cases():
+                old_plan, old_time, old_rows = measure(connection, old, options.repeat)
+                new_plan, new_time, new_rows = measure(connection, new, options.repeat)
+                print(f"{name}: {old_time * 1000:.2f}ms -> {new_time * 1000:.2f}ms "
+                      f"({old_time / max(new_time, 1e-9):.1f}x), {new_rows} rows")
+                print(f"  before: {'; '.join(old_plan)}")
+                print(f"  after:  {'; '.join(new_plan)}\n")
+                if FULL_SCAN in new_plan:
+                    failures.append(f"{name} still scans attendance_record")
+                if old_rows != new_rows:
+                    failures.append(f"{name} matched {new_rows} rows, not {old_rows}")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if not failures:
+        print("ok")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
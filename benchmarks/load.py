@@ -0,0 +1,266 @@
+"""End-to-end load benchmark against a synthetic database.
+
+Builds an app with the user blueprint, the database profile and the
+caches configured as in `main.create_app`, and drives it through
+Werkzeug's test `Client`, which constructs each request with an
+`EnvironBuilder`. For login, the student dashboard, marking attendance and
+the lecturer attendance records it reports p50/p95/p99 latency, throughput
+and SQL statements per request, then compares them with stored baselines.
+
+Marking attendance writes today's records into the database; after the
+first pass the same students are skipped as already marked.
+
+Run from the project root, against a database from benchmarks.synthetic:
+
+    python -m benchmarks.synthetic --database instance/synthetic.db
+    python -m benchmarks.load --database instance/synthetic.db --save-baseline
+    python -m benchmarks.load --database instance/synthetic.db
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask, redirect, render_template, url_for
+from flask_login import LoginManager
+from werkzeug.test import Client
+
+from config import config
+from database import init_database
+from models import db, Course, Lecturer, Student
+from profiling import count_statements
+from user.cache import load_user_snapshot, user_cache
+from user.forms import REFERENCE_CHOICES
+from user.passwords import password_verifier
+from user.routes import user_bp
+from user.timetable import timetable
+
+basedir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+Scenario = namedtuple('Scenario', ['name', 'setup', 'request', 'expected_status'])
+Result = namedtuple('Result', ['requests', 'errors', 'p50_ms', 'p95_ms', 'p99_ms',
+                               'throughput', 'statements_per_request'])
+
+MARKED_STUDENTS = 50
+USER_SAMPLE = 200
+
+
+def build_app(database):
+    """An app serving the user pages from `database`.
+
+    Importing main would build its module-level app, starting the
+    check-in flush and counter reconciliation threads, so like the other
+    benchmarks this builds its own app with the blueprint under test.
+    """
+    app = Flask(__name__, root_path=basedir)
+    app.config.from_object(config)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f'sqlite:///{os.path.abspath(database)}',
+        WTF_CSRF_ENABLED=False
+    )
+    init_database(app)
+
+    login_manager = LoginManager(app)
+    login_manager.login_view = 'user.login'
+    login_manager.user_loader(lambda user_id: load_user_snapshot(int(user_id)))
+    user_cache.maxsize = app.config['USER_CACHE_SIZE']
+    user_cache.ttl = app.config['USER_CACHE_TTL']
+    for choices in REFERENCE_CHOICES:
+        choices.ttl = app.config['REFERENCE_CHOICES_TTL']
+    timetable.ttl = app.config['TIMETABLE_TTL']
+    password_verifier.workers = app.config['PASSWORD_POOL_WORKERS']
+    password_verifier.max_pending = app.config['PASSWORD_POOL_MAX_PENDING']
+    password_verifier.method = app.config['PASSWORD_HASH_METHOD']
+    password_verifier.retry_after = app.config['PASSWORD_RETRY_AFTER']
+
+    app.register_blueprint(user_bp)
+    # The page templates link to these app-level endpoints
+    app.add_url_rule('/', 'index', lambda: render_template('common_view/index.html'))
+    app.add_url_rule('/logout', 'logout', lambda: redirect(url_for('user.logout')))
+    return app
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of sorted `values`."""
+    if not values:
+        return 0.0
+    rank = math.ceil(pct / 100 * len(values)) - 1
+    return values[min(max(rank, 0), len(values) - 1)]
+
+
+def sample_users(app, rng):
+    """Pick login ids to use, plus the lecturer with the most courses and their rosters."""
+    with app.app_context():
+        student_ids = db.session.scalars(db.select(Student.student_number)).all()
+        lecturer_id, staff_number = db.session.execute(
+            db.select(Lecturer.id, Lecturer.staff_number)
+            .join(Course, Course.lecturer_id == Lecturer.id)
+            .group_by(Lecturer.id)
+            .order_by(db.func.count(Course.id).desc())
+            .limit(1)
+        ).one()
+        courses = db.session.scalars(db.select(Course).where(Course.lecturer_id == lecturer_id)).all()
+        rosters = [
+            (course.id, [student.id for student in course.students[:MARKED_STUDENTS]])
+            for course in courses
+        ]
+    return rng.sample(student_ids, min(USER_SAMPLE, len(student_ids))), staff_number, rosters
+
+
+def logged_in_client(app, login_id, password):
+    client = Client(app)
+    response = client.post('/login', data={
+        'matric_number': login_id, 'password': password, 'student_type': 'full-time'
+    })
+    if response.status_code != 302:
+        raise RuntimeError(f"Could not log in as {login_id} (status {response.status_code})")
+    return client
+
+
+def build_scenarios(app, options, rng):
+    students, staff_number, rosters = sample_users(app, rng)
+    password = options.password
+
+    def login(client, i):
+        return client.post('/login', data={
+            'matric_number': students[i % len(students)], 'password': password,
+            'student_type': 'full-time'
+        })
+
+    def mark_attendance(client, i):
+        course_id, student_ids = rosters[i % len(rosters)]
+        return client.post('/mark-attendance', data={
+            'course_id': course_id, 'student_ids': student_ids,
+            'status': 'Present' if i % 5 else 'Absent'
+        })
+
+    return [
+        # Fresh clients without cookies so every request is a full login
+        Scenario('login', lambda worker: Client(app, use_cookies=False), login, 302),
+        Scenario('dashboard',
+                 lambda worker: logged_in_client(app, students[worker % len(students)], password),
+                 lambda client, i: client.get('/dashboard'), 200),
+        Scenario('mark_attendance',
+                 lambda worker: logged_in_client(app, staff_number, password),
+                 mark_attendance, 302),
+        Scenario('attendance_record',
+                 lambda worker: logged_in_client(app, staff_number, password),
+                 lambda client, i: client.get('/attendance-record'), 200),
+    ]
+
+
+def run_scenario(app, scenario, requests, concurrency):
+    # Log every worker in before timing starts
+    clients = [scenario.setup(worker) for worker in range(concurrency)]
+    local = threading.local()
+    next_client = iter(clients)
+    lock = threading.Lock()
+
+    def timed(i):
+        if not hasattr(local, 'client'):
+            with lock:
+                local.client = next(next_client)
+        started = time.perf_counter()
+        response = scenario.request(local.client, i)
+        elapsed = time.perf_counter() - started
+        response.close()
+        return elapsed, response.status_code == scenario.expected_status
+
+    with app.app_context():
+        engine = db.engine
+    with count_statements(engine) as counter:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(timed, range(requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    return Result(
+        requests=requests,
+        errors=sum(1 for _, ok in results if not ok),
+        p50_ms=percentile(latencies, 50),
+        p95_ms=percentile(latencies, 95),
+        p99_ms=percentile(latencies, 99),
+        throughput=requests / elapsed,
+        statements_per_request=counter.count / requests,
+    )
+
+
+def compare(result, baseline, tolerance):
+    """Return the ways `result` is worse than `baseline`."""
+    problems = []
+    if result.errors:
+        problems.append(f"{result.errors} unexpected responses")
+    if baseline is None:
+        return problems
+    if result.p95_ms > baseline['p95_ms'] * (1 + tolerance):
+        problems.append(f"p95 {result.p95_ms:.1f}ms > baseline {baseline['p95_ms']:.1f}ms")
+    if result.statements_per_request > baseline['statements_per_request'] + 0.5:
+        problems.append(
+            f"{result.statements_per_request:.1f} statements/request > "
+            f"baseline {baseline['statements_per_request']:.1f}"
+        )
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the app against a synthetic database.")
+    parser.add_argument('--database', default=os.path.join(basedir, 'instance', 'synthetic.db'))
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--requests', type=int, default=200, help="Requests per scenario.")
+    parser.add_argument('--concurrency', type=int, default=1, help="Client threads per scenario.")
+    parser.add_argument('--only', action='append', help="Run only this scenario (repeatable).")
+    parser.add_argument('--baseline', default=os.path.join(basedir, 'benchmarks', 'baselines.json'))
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the baseline.")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed p95 slowdown over the baseline, as a fraction.")
+    parser.add_argument('--seed', type=int, default=1)
+    options = parser.parse_args(argv)
+
+    if not os.path.exists(options.database):
+        print(f"❌ {options.database} does not exist; build it with python -m benchmarks.synthetic")
+        return 1
+    app = build_app(options.database)
+    scenarios = [s for s in build_scenarios(app, options, random.Random(options.seed))
+                 if not options.only or s.name in options.only]
+
+    # Baselines are stored per concurrency level: {"1": {"login": {...}}}
+    stored = {}
+    if os.path.exists(options.baseline):
+        with open(options.baseline) as f:
+            stored = json.load(f)
+    baselines = stored.setdefault(str(options.concurrency), {})
+
+    print(f"{'scenario':<18} {'reqs':>5} {'errs':>5} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'req/s':>8} {'stmts':>6}")
+    results, failed = {}, False
+    for scenario in scenarios:
+        result = run_scenario(app, scenario, options.requests, options.concurrency)
+        results[scenario.name] = result
+        problems = compare(result, baselines.get(scenario.name), options.tolerance)
+        failed = failed or bool(problems)
+        print(f"{scenario.name:<18} {result.requests:>5} {result.errors:>5} {result.p50_ms:>8.1f} "
+              f"{result.p95_ms:>8.1f} {result.p99_ms:>8.1f} {result.throughput:>8.1f} "
+              f"{result.statements_per_request:>6.1f}  {'; '.join(problems) or 'ok'}")
+
+    if options.save_baseline:
+        baselines.update({
+            name: {'p95_ms': round(result.p95_ms, 2),
+                   'statements_per_request': round(result.statements_per_request, 2)}
+            for name, result in results.items()
+        })
+        with open(options.baseline, 'w') as f:
+            json.dump(stored, f, indent=2)
+        print(f"✅ Saved baseline to {options.baseline}")
+        return 0
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""Check that the attendance pages run a constant number of SQL statements.
+
+Seeds an in-memory database with a growing number of attendance records,
+requests each page as a logged in lecturer and fails if the number of
+statements changes with the number of rows.
+
+Run from the project root:
+
+    python -m benchmarks.statement_counts
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+from flask import Flask
+from flask_login import LoginManager
+
+from models import (
+    Student, Lecturer, Department, Faculty,
+    Level, Semester, Course, AttendanceRecord, db
+)
+from profiling import count_statements
+from user.cache import load_user_snapshot
+from user.routes import user_bp
+
+ROW_COUNTS = (10, 100, 1000)
+PAGES = (
+    '/attendance-record',
+    '/attendance-record/query',
+    '/attendance-record/query?search=Student',
+)
+
+basedir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+
+def build_app():
+    app = Flask(__name__, template_folder=os.path.join(basedir, 'templates'))
+    app.config.update(
+        SECRET_KEY='statement-counts',
+        SQLALCHEMY_DATABASE_URI='sqlite://',
+        WTF_CSRF_ENABLED=False
+    )
+    db.init_app(app)
+
+    login_manager = LoginManager(app)
+    login_manager.user_loader(lambda user_id: load_user_snapshot(int(user_id)))
+
+    app.register_blueprint(user_bp)
+    app.add_url_rule('/', 'index', lambda: '')
+    return app
+
+
+def seed(record_count):
+    """Create a small institution and `record_count` attendance records."""
+    faculty = Faculty(name='Engineering')
+    semester = Semester(name='First Semester')
+    departments = [Department(name=f'Department {i}', faculty=faculty) for i in range(3)]
+    levels = [Level(name=name) for name in ('ND1', 'ND2', 'HND1')]
+    lecturer = Lecturer(
+        email='lecturer@example.com', password='-', name='Lecturer',
+        role='lecturer', staff_number='STAFF1',
+        department=departments[0], faculty=faculty
+    )
+    courses = [
+        Course(name=f'Course {i}', department=departments[i % 3], lecturer=lecturer, semester=semester)
+        for i in range(5)
+    ]
+    students = [
+        Student(
+            email=f'student{i}@example.com', password='-', name=f'Student {i}',
+            role='student', student_number=f'STU{i:05d}',
+            department=departments[i % 3], faculty=faculty, level=levels[i % 3]
+        )
+        for i in range(max(record_count // 5, 1))
+    ]
+    db.session.add_all([faculty, semester, lecturer, *departments, *levels, *courses, *students])
+    db.session.flush()
+
+    start = datetime(2025, 1, 6, 8)
+    db.session.add_all([
+        AttendanceRecord(
+            student_id=students[i % len(students)].id,
+            course_id=courses[i % len(courses)].id,
+            lecturer_id=lecturer.id,
+            status='present' if i % 4 else 'absent',
+            timestamp=start + timedelta(days=i)
+        )
+        for i in range(record_count)
+    ])
+    db.session.commit()
+    return lecturer.id
+
+
+def measure(app, record_count):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        lecturer_id = seed(record_count)
+        engine = db.engine
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(lecturer_id)
+        session['_fresh'] = True
+
+    counts = {}
+    for page in PAGES:
+        with count_statements(engine) as counter:
+            response = client.get(page)
+        if response.status_code != 200:
+            raise RuntimeError(f"{page} returned {response.status_code}")
+        counts[page] = counter.count
+    return counts
+
+
+def main():
+    app = build_app()
+    results = {rows: measure(app, rows) for rows in ROW_COUNTS}
+
+    failed = False
+    for page in PAGES:
+        counts = [results[rows][page] for rows in ROW_COUNTS]
+        constant = len(set(counts)) == 1
+        failed = failed or not constant
+        summary = ', '.join(f"{rows} rows: {count}" for rows, count in zip(ROW_COUNTS, counts))
+        print(f"{'ok  ' if constant else 'FAIL'} {page} ({summary})")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
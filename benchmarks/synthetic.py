@@ -0,0 +1,217 @@
+"""Build a synthetic institution to load test against.
+
+Creates faculties, departments, levels, semesters, lecturers, students,
+courses, one class session per course and a semester of weekly attendance
+in a new database. Rows are written to the models' tables with Core
+executemany batches, as millions of ORM objects would take hours; the
+attendance summary and dashboard counters are rebuilt afterwards.
+
+The defaults give 50k students, 1k lecturers and about 3.6M attendance
+records. Run from the project root:
+
+    python -m benchmarks.synthetic --database instance/synthetic.db
+    python -m benchmarks.synthetic --database /tmp/small.db --students 2000 --lecturers 50 --weeks 4
+
+Every user's password is --password ("password" by default).
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, time as time_of_day, timedelta
+from itertools import islice
+
+from flask import Flask
+from werkzeug.security import generate_password_hash
+
+from config import config
+from database import init_database
+from models import (
+    db, User, Student, Lecturer, Faculty, Department, Level, Semester,
+    Course, ClassSession, AttendanceRecord, student_course_table,
+    create_tables, create_levels, create_semester, format_schedule,
+    rebuild_attendance_summary, reconcile_counters
+)
+
+BATCH_SIZE = 20000
+STATUS_WEIGHTS = (('Present', 85), ('Absent', 12), ('Excused', 3))
+# A Monday; class sessions meet weekly from here
+SEMESTER_START = datetime(2025, 1, 6)
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday')
+
+basedir = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+
+def build_app(database_uri):
+    app = Flask(__name__)
+    app.config.from_object(config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    init_database(app)
+    return app
+
+
+def insert_rows(table, rows):
+    """Insert an iterable of row dicts into `table` in batches. Returns the row count."""
+    rows = iter(rows)
+    count = 0
+    while batch := list(islice(rows, BATCH_SIZE)):
+        db.session.execute(db.insert(table), batch)
+        count += len(batch)
+    return count
+
+
+def generate(options):
+    """Populate the empty database of the current app. Returns row counts per table."""
+    if db.session.scalar(db.select(db.func.count()).select_from(User.__table__)):
+        raise SystemExit("❌ The database already has users; point --database at a new file.")
+
+    rng = random.Random(options.seed)
+    create_semester()
+    create_levels()
+    semester_id = db.session.scalar(db.select(Semester.id).order_by(Semester.id))
+    levels = db.session.execute(db.select(Level.id, Level.name).order_by(Level.id)).all()
+    pwhash = generate_password_hash(options.password, config.PASSWORD_HASH_METHOD)
+    counts = {}
+
+    faculties = [{'id': i, 'name': f'Faculty {i}'} for i in range(1, options.faculties + 1)]
+    departments = [
+        {'id': len(faculties) * d + faculty['id'], 'name': f"Department {faculty['id']}.{d + 1}",
+         'faculty_id': faculty['id']}
+        for faculty in faculties
+        for d in range(options.departments_per_faculty)
+    ]
+    counts['faculty'] = insert_rows(Faculty.__table__, faculties)
+    counts['department'] = insert_rows(Department.__table__, departments)
+
+    next_user_id = iter(range(1, options.lecturers + options.students + 1))
+    lecturer_users, lecturer_rows = [], []
+    lecturers_by_department = defaultdict(list)
+    for i in range(options.lecturers):
+        user_id = next(next_user_id)
+        department = departments[i % len(departments)]
+        staff_number = f'STAFF{i:05d}'
+        lecturer_users.append({
+            'id': user_id, 'email': f'lecturer{i}@synthetic.test', 'password': pwhash,
+            'name': f'Lecturer {i}', 'role': 'lecturer', 'type': 'lecturer', 'login_id': staff_number
+        })
+        lecturer_rows.append({
+            'id': user_id, 'staff_number': staff_number,
+            'department_id': department['id'], 'faculty_id': department['faculty_id']
+        })
+        lecturers_by_department[department['id']].append(user_id)
+    insert_rows(User.__table__, lecturer_users)
+    counts['lecturer'] = insert_rows(Lecturer.__table__, lecturer_rows)
+
+    courses, sessions = [], []
+    courses_by_group = defaultdict(list)
+    for department in departments:
+        for level_id, level_name in levels:
+            for k in range(options.courses_per_group):
+                course_id = len(courses) + 1
+                lecturers = lecturers_by_department[department['id']]
+                lecturer_id = rng.choice(lecturers) if lecturers else None
+                weekday, hour = course_id % len(WEEKDAYS), 8 + 2 * (course_id % 4)
+                courses.append({
+                    'id': course_id, 'name': f"{department['name']} {level_name} Course {k + 1}",
+                    'department_id': department['id'], 'lecturer_id': lecturer_id,
+                    'semester_id': semester_id
+                })
+                # The slot repeats every 20 courses, so a room per 20 never double-books
+                start, end = time_of_day(hour), time_of_day(hour + 2)
+                sessions.append({
+                    'id': course_id, 'course_code': f'CRS{course_id:05d}',
+                    'title': courses[-1]['name'], 'time': format_schedule(weekday, start, end),
+                    'weekday': weekday, 'start_time': start, 'end_time': end,
+                    'room': f'Room {course_id // 20 + 1}', 'semester_id': semester_id,
+                    'department_id': department['id'], 'level_id': level_id,
+                    'lecturer_id': lecturer_id, 'created_at': SEMESTER_START
+                })
+                courses_by_group[department['id'], level_id].append((course_id, lecturer_id, weekday, hour))
+    counts['course'] = insert_rows(Course.__table__, courses)
+    counts['class_session_record'] = insert_rows(ClassSession.__table__, sessions)
+
+    groups = list(courses_by_group)
+    faculty_of = {department['id']: department['faculty_id'] for department in departments}
+    students_by_group = defaultdict(list)
+    student_users, student_rows = [], []
+    for i in range(options.students):
+        user_id = next(next_user_id)
+        department_id, level_id = groups[i % len(groups)]
+        student_number = f'STU{i:06d}'
+        student_users.append({
+            'id': user_id, 'email': f'student{i}@synthetic.test', 'password': pwhash,
+            'name': f'Student {i}', 'role': 'student', 'type': 'student', 'login_id': student_number
+        })
+        student_rows.append({
+            'id': user_id, 'student_number': student_number, 'level_id': level_id,
+            'department_id': department_id, 'faculty_id': faculty_of[department_id]
+        })
+        students_by_group[department_id, level_id].append(user_id)
+    insert_rows(User.__table__, student_users)
+    counts['student'] = insert_rows(Student.__table__, student_rows)
+    counts['student_course'] = insert_rows(student_course_table, (
+        {'student_id': student_id, 'course_id': course_id}
+        for group, students in students_by_group.items()
+        for course_id, _, _, _ in courses_by_group[group]
+        for student_id in students
+    ))
+    db.session.commit()
+
+    counts['attendance_record'] = insert_rows(
+        AttendanceRecord.__table__,
+        attendance_rows(courses_by_group, students_by_group, semester_id, options.weeks, rng)
+    )
+    db.session.commit()
+
+    counts['attendance_summary'] = rebuild_attendance_summary()
+    reconcile_counters()
+    return counts
+
+
+def attendance_rows(courses_by_group, students_by_group, semester_id, weeks, rng):
+    statuses, weights = zip(*STATUS_WEIGHTS)
+    for week in range(weeks):
+        for group, courses in courses_by_group.items():
+            students = students_by_group[group]
+            for course_id, lecturer_id, weekday, hour in courses:
+                if lecturer_id is None or not students:
+                    continue
+                held_at = SEMESTER_START + timedelta(weeks=week, days=weekday, hours=hour)
+                for student_id, status in zip(students, rng.choices(statuses, weights, k=len(students))):
+                    yield {
+                        'student_id': student_id, 'course_id': course_id,
+                        'lecturer_id': lecturer_id, 'class_session_id': course_id,
+                        'semester_id': semester_id, 'status': status, 'timestamp': held_at
+                    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a synthetic attendance database.")
+    parser.add_argument('--database', default=os.path.join(basedir, 'instance', 'synthetic.db'),
+                        help="SQLite file to create (must not contain users yet).")
+    parser.add_argument('--faculties', type=int, default=5)
+    parser.add_argument('--departments-per-faculty', type=int, default=4)
+    parser.add_argument('--lecturers', type=int, default=1000)
+    parser.add_argument('--students', type=int, default=50000)
+    parser.add_argument('--courses-per-group', type=int, default=6,
+                        help="Courses per department and level; students take all of their group's.")
+    parser.add_argument('--weeks', type=int, default=12, help="Weeks of attendance to record.")
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--seed', type=int, default=1)
+    options = parser.parse_args(argv)
+
+    app = build_app(f'sqlite:///{os.path.abspath(options.database)}')
+    create_tables(app)
+    started = time.perf_counter()
+    with app.app_context():
+        counts = generate(options)
+    for table, count in counts.items():
+        print(f"{table:>22}: {count}")
+    print(f"✅ Built {options.database} in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+import json
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from admin.analytics import AVAILABLE, GROUPINGS, AttendanceFrame, attendance_report
+from archive import archive_semester
+from models import create_tables, rebuild_attendance_summary, reconcile_counters, seed_database
+
+
+@click.command('seed')
+@click.option('--admin-email', help='Super admin email (defaults to SUPER_ADMIN_EMAIL).')
+@click.option('--admin-name', help='Super admin name (defaults to SUPER_ADMIN_NAME).')
+@click.option('--admin-password', help='Super admin password (defaults to SUPER_ADMIN_PASSWORD).')
+@with_appcontext
+def seed_command(admin_email, admin_name, admin_password):
+    """Create the tables and seed semesters, levels and the super admin.
+
+    Safe to run more than once; existing rows are kept.
+    """
+    config = current_app.config
+    create_tables(current_app)
+    seed_database(
+        admin_email or config['SUPER_ADMIN_EMAIL'],
+        admin_name or config['SUPER_ADMIN_NAME'],
+        admin_password or config['SUPER_ADMIN_PASSWORD']
+    )
+
+
+@click.command('rebuild-attendance-summary')
+@with_appcontext
+def rebuild_attendance_summary_command():
+    """Recompute the attendance summary table from the raw records."""
+    rows = rebuild_attendance_summary()
+    click.echo(f"✅ Rebuilt {rows} attendance summary rows.")
+
+
+@click.command('reconcile-counters')
+@with_appcontext
+def reconcile_counters_command():
+    """Recount the admin dashboard counters from their tables."""
+    counts = reconcile_counters()
+    click.echo("✅ " + ", ".join(f"{name}: {value}" for name, value in counts.items()))
+
+
+@click.command('archive-semester')
+@click.argument('semester_id', type=int)
+@click.option('--directory', help='Where to write the archive (defaults to ATTENDANCE_ARCHIVE_DIR).')
+@click.option('--force', is_flag=True, help='Archive even if the semester had attendance recently.')
+@with_appcontext
+def archive_semester_command(semester_id, directory, force):
+    """Move a closed semester's attendance records into a read-only archive file."""
+    config = current_app.config
+    try:
+        archive = archive_semester(
+            semester_id,
+            directory or config['ATTENDANCE_ARCHIVE_DIR'],
+            min_idle_days=config['ARCHIVE_MIN_IDLE_DAYS'],
+            force=force
+        )
+    except ValueError as error:
+        raise click.ClickException(str(error))
+    click.echo(f"✅ Archived {archive.records} records of {archive.semester.name} "
+               f"to {archive.filename} ({archive.size_bytes / 1024 / 1024:.1f} MB).")
+
+
+@click.command('attendance-report')
+@click.option('--by', type=click.Choice(list(GROUPINGS)), default='department', show_default=True)
+@click.option('--department', 'department_id', type=int, help='Only this department.')
+@click.option('--level', 'level_id', type=int, help='Only this level.')
+@click.option('--course', 'course_id', type=int, help='Only this course.')
+@click.option('--semester', 'semester_id', type=int, help='Only this semester.')
+@click.option('--start', type=click.DateTime(['%Y-%m-%d']), help='First day to include.')
+@click.option('--end', type=click.DateTime(['%Y-%m-%d']), help='Last day to include.')
+@click.option('--threshold', type=float, help='At-risk cut-off in percent (defaults to ANALYTICS_AT_RISK_PERCENT).')
+@click.option('--min-records', type=int, help='Fewest records to judge a student on (defaults to ANALYTICS_MIN_RECORDS).')
+@click.option('--window', type=int, default=4, show_default=True, help='Weeks in the rolling rate.')
+@click.option('--limit', type=int, default=50, show_default=True, help='At-risk students to list.')
+@click.option('--json', 'as_json', is_flag=True, help='Print the report as JSON.')
+@with_appcontext
+def attendance_report_command(by, threshold, min_records, window, limit, as_json, start, end, **filters):
+    """Print attendance rates, the weekly trend and students below the threshold."""
+    if not AVAILABLE:
+        raise click.ClickException("Attendance analytics need NumPy installed.")
+    config = current_app.config
+    report = attendance_report(
+        AttendanceFrame.load(),
+        by=by,
+        threshold=config['ANALYTICS_AT_RISK_PERCENT'] if threshold is None else threshold,
+        min_records=config['ANALYTICS_MIN_RECORDS'] if min_records is None else min_records,
+        window=window,
+        limit=limit,
+        start=start.date() if start else None,
+        end=end.date() if end else None,
+        **filters
+    )
+    if as_json:
+        click.echo(json.dumps(report, indent=2))
+        return
+
+    def rate(value):
+        return '-' if value is None else f"{value:.1f}%"
+
+    click.echo(f"Attendance by {by} ({report['records']} records)")
+    for group in report['groups']:
+        click.echo(f"  {group['name'] or '(none)':<40} {rate(group['rate']):>7}  {group['records']:>9} records")
+    click.echo(f"\nWeekly rate (rolling {window} weeks)")
+    for week in report['weekly']:
+        click.echo(f"  {week['week_start']}  {rate(week['rate']):>7}  {rate(week['rolling_rate']):>7}")
+    click.echo(f"\nStudents below {report['threshold']:g}%: {len(report['at_risk'])}")
+    for entry in report['at_risk']:
+        click.echo(f"  {entry['student_number'] or entry['student_id']:<15} {entry['name'] or '':<30} {rate(entry['rate']):>7}")
@@ -11,6 +11,66 @@ class Config(BaseSettings):
     SECRET_KEY: str = 'your-secret-key'
     SQLALCHEMY_DATABASE_URI: str = f'sqlite:///{os.path.join(basedir, 'instance/attendance.db')}'
     SQLALCHEMY_TRACK_MODIFICATIONS: Optional[bool] = False
+    SQLALCHEMY_ECHO: bool = False
+    # Per-request SQL and timing metrics, see middleware/sql_metrics.py
+    SQL_METRICS_SAMPLE_RATE: float = 0.05
+    SQL_METRICS_BUFFER_SIZE: int = 500
+    SQL_METRICS_SLOWEST: int = 5
+    # Optional read-only database for report pages, e.g. a replica or the
+    # same SQLite file opened with sqlite:///file:instance/attendance.db?mode=ro&uri=true
+    SQLALCHEMY_READ_DATABASE_URI: Optional[str] = None
+    # SQLite profile applied to every connection, see database.py
+    SQLITE_JOURNAL_MODE: str = 'WAL'
+    SQLITE_SYNCHRONOUS: str = 'NORMAL'
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024
+    SQLITE_FOREIGN_KEYS: bool = True
+    SQLITE_POOL_SIZE: int = 10
+    SQLITE_MAX_OVERFLOW: int = 20
+    # What create_app does to the database on startup: 'schema' creates or
+    # upgrades the tables, 'seed' also seeds reference data and the super
+    # admin below, 'none' leaves it alone (run `flask seed` instead).
+    ATTENDANCE_BOOTSTRAP: str = 'schema'
+    SUPER_ADMIN_EMAIL: Optional[str] = None
+    SUPER_ADMIN_NAME: str = 'Super Admin'
+    SUPER_ADMIN_PASSWORD: Optional[str] = None
+    # Per-process cache of logged in users, see user/cache.py
+    USER_CACHE_SIZE: int = 1024
+    USER_CACHE_TTL: int = 60
+    # Cached department/level form choices, see user/forms.py. The TTL
+    # bounds staleness after changes made by another process.
+    REFERENCE_CHOICES_TTL: int = 300
+    # In-memory class timetable, see user/timetable.py; same staleness bound
+    TIMETABLE_TTL: int = 300
+    # Seconds between recounts of the admin dashboard counters; 0 disables
+    COUNTER_RECONCILE_INTERVAL: int = 3600
+    # Password hashing pool, see user/passwords.py. Workers default to one
+    # per CPU; 0 hashes on the request thread.
+    PASSWORD_POOL_WORKERS: Optional[int] = None
+    PASSWORD_POOL_MAX_PENDING: int = 32
+    PASSWORD_HASH_METHOD: str = 'scrypt:32768:8:1'
+    PASSWORD_RETRY_AFTER: int = 5
+    # Self check-in, see user/checkin.py: code rotation period, how long a
+    # window stays open, how often accepted check-ins are saved, and how
+    # many flushes a failing class gets before its check-ins are dropped.
+    CHECKIN_CODE_TTL: int = 30
+    CHECKIN_WINDOW_MINUTES: int = 15
+    CHECKIN_FLUSH_INTERVAL: float = 1.0
+    CHECKIN_FLUSH_BATCH: int = 200
+    CHECKIN_FLUSH_ATTEMPTS: int = 5
+    # Attendance analytics, see admin/analytics.py: how long loaded records
+    # are reused, and the rate below which students are listed as at risk.
+    ANALYTICS_TTL: int = 600
+    ANALYTICS_AT_RISK_PERCENT: float = 75.0
+    ANALYTICS_MIN_RECORDS: int = 5
+    # Read-only files of archived semesters' attendance, see archive.py
+    ATTENDANCE_ARCHIVE_DIR: str = os.path.join(basedir, 'instance', 'archive')
+    ARCHIVE_CATALOG_TTL: int = 300
+    ARCHIVE_MMAP_SIZE: int = 256 * 1024 * 1024
+    ARCHIVE_MIN_IDLE_DAYS: int = 30
+    # Hashing workers for bulk CSV student imports, see admin/student_import.py
+    STUDENT_IMPORT_WORKERS: Optional[int] = None
     model_config = SettingsConfigDict(env_file=".env", extra='ignore')
 
 config = Config()
@@ -0,0 +1,102 @@
+from functools import wraps
+
+from flask import g
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from models import db, READ_BIND
+
+
+def is_sqlite_file(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def sqlite_engine_options(config, uri):
+    """Engine options for a file-backed SQLite database shared by threads.
+
+    Connections may be handed between request threads, so the pool keeps a
+    few open and sqlite3's own thread check is turned off. In-memory
+    databases keep Flask-SQLAlchemy's single static connection.
+    """
+    if not is_sqlite_file(uri):
+        return {}
+    return {
+        'pool_size': config['SQLITE_POOL_SIZE'],
+        'max_overflow': config['SQLITE_MAX_OVERFLOW'],
+        'connect_args': {
+            'check_same_thread': False,
+            'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000,
+            # Lets archive.py ATTACH semester archives read-only by file: URI
+            'uri': True,
+        },
+    }
+
+
+def apply_sqlite_pragmas(engine, config, read_only=False):
+    """Set the connection pragmas of the SQLite profile on every new connection.
+
+    WAL lets readers carry on while a write commits, and busy_timeout makes a
+    writer wait for the lock instead of failing with "database is locked".
+    Read-only engines leave the journal mode to the primary and refuse
+    writes outright.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = [
+        f"busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"foreign_keys = {'ON' if config['SQLITE_FOREIGN_KEYS'] else 'OFF'}",
+        f"cache_size = {-int(config['SQLITE_CACHE_SIZE_KB'])}",
+    ]
+    if read_only:
+        pragmas.append("query_only = ON")
+    elif is_sqlite_file(str(engine.url)):
+        pragmas += [
+            f"journal_mode = {config['SQLITE_JOURNAL_MODE']}",
+            f"synchronous = {config['SQLITE_SYNCHRONOUS']}",
+            f"mmap_size = {int(config['SQLITE_MMAP_SIZE'])}",
+        ]
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(f"PRAGMA {pragma}")
+        cursor.close()
+
+
+def init_database(app):
+    """Initialise `db` for `app` with the SQLite profile from its config.
+
+    When SQLALCHEMY_READ_DATABASE_URI is set it becomes the read bind that
+    views decorated with `read_only` query.
+    """
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **sqlite_engine_options(app.config, app.config['SQLALCHEMY_DATABASE_URI']),
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+    }
+    read_uri = app.config.get('SQLALCHEMY_READ_DATABASE_URI')
+    if read_uri:
+        app.config['SQLALCHEMY_BINDS'] = {
+            **app.config.get('SQLALCHEMY_BINDS', {}),
+            READ_BIND: {'url': read_uri, **sqlite_engine_options(app.config, read_uri)},
+        }
+
+    db.init_app(app)
+    with app.app_context():
+        for key, engine in db.engines.items():
+            apply_sqlite_pragmas(engine, app.config, read_only=key == READ_BIND)
+
+
+def read_only(view):
+    """Run the view's queries against the read database, if there is one.
+
+    Only for views that never write; anything they flush still goes to the
+    primary, but Core statements outside a flush are not checked.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_only = True
+        return view(*args, **kwargs)
+    return wrapper
@@ -4,9 +4,17 @@ from wtforms import (
     PasswordField, SubmitField,
     StringField
 )
-from wtforms.validators import DataRequired, Email, EqualTo, Length
+from wtforms.validators import DataRequired, Email, EqualTo, Length, ValidationError
 import datetime
 
+from models import login_id_taken
+
+
+def validate_login_id(form, field):
+    """Refuse a student or staff number another user already logs in with."""
+    if field.data and login_id_taken(field.data.strip()):
+        raise ValidationError("This number is already used to log in by another student or staff member.")
+
 
 class LoginForm(FlaskForm):
     matric_number = IntegerField('Email', validators=[DataRequired()])
@@ -31,7 +39,7 @@ class AddStudentForm(FlaskForm):
     name = StringField('Name', validators=[DataRequired()])
     email = StringField('Email', validators=[DataRequired(), Email()])
     password = PasswordField('Password', validators=[DataRequired()])
-    student_number = StringField('Student Number', validators=[DataRequired()])
+    student_number = StringField('Student Number', validators=[DataRequired(), validate_login_id])
     department_id = SelectField('Department', coerce=int, validators=[DataRequired()])
     course_id = SelectField('Course', coerce=int, validators=[])
     submit = SubmitField('Add Student')
@@ -40,7 +48,7 @@ class AddLecturerForm(FlaskForm):
     name = StringField('Name', validators=[DataRequired()])
     email = StringField('Email', validators=[DataRequired(), Email()])
     password = PasswordField('Password', validators=[DataRequired()])
-    staff_number = StringField('Staff Number', validators=[DataRequired()])
+    staff_number = StringField('Staff Number', validators=[DataRequired(), validate_login_id])
     department_id = SelectField('Department', coerce=int, validators=[DataRequired()])
     submit = SubmitField('Add Lecturer')
 
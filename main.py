@@ -3,15 +3,26 @@ from forms import LoginForm
 from werkzeug.security import generate_password_hash
 import os
 from admin.routes import admin_bp
+from admin.student_import import student_import_bp, import_hasher
+from admin.stats import admin_stats_bp, start_counter_reconciliation
+from admin.analytics import frame_cache
+from archive import archives
 from user.routes import user_bp
+from user.cache import user_cache, load_user_snapshot
+from user.forms import REFERENCE_CHOICES
+from user.timetable import timetable
+from user.passwords import password_verifier
+from user.checkin import checkin_bp, checkin_table, checkin_buffer
 
-from flask_login import LoginManager
-from models import (
-    User, db, create_tables,
-    create_super_admin, create_semester,
-    create_levels
-)
+from flask_login import LoginManager, current_user
+from models import create_tables, seed_database
 from config import config
+from database import init_database
+from middleware.sql_metrics import sql_metrics
+from commands import (
+    archive_semester_command, attendance_report_command,
+    rebuild_attendance_summary_command, reconcile_counters_command, seed_command
+)
 
 login_manager = LoginManager()
 login_manager.login_view = 'admin.login'
@@ -22,24 +33,59 @@ def create_app():
     # app.config['SECRET_KEY'] = 'your-secret'
     # app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///yourdb.db'
     app.config.from_object(config)
-    db.init_app(app)
+    init_database(app)
     login_manager.init_app(app)
-    # # Call create_tables after init_app
-    create_tables(app)
-    # create super admin
-    verify = input("Is this the first time you are running the script (Y/N)? ")
-    if verify.lower() == "y":
-        create_super_admin(app)
-        create_semester(app)
-        create_levels(app)
-    
+    sql_metrics.init_app(app)
+    sql_metrics.authorize = lambda: current_user.is_authenticated and current_user.role == 'admin'
+    user_cache.maxsize = app.config['USER_CACHE_SIZE']
+    user_cache.ttl = app.config['USER_CACHE_TTL']
+    for choices in REFERENCE_CHOICES:
+        choices.ttl = app.config['REFERENCE_CHOICES_TTL']
+    timetable.ttl = app.config['TIMETABLE_TTL']
+    frame_cache.ttl = app.config['ANALYTICS_TTL']
+    archives.directory = app.config['ATTENDANCE_ARCHIVE_DIR']
+    archives.ttl = app.config['ARCHIVE_CATALOG_TTL']
+    archives.mmap_size = app.config['ARCHIVE_MMAP_SIZE']
+    password_verifier.workers = app.config['PASSWORD_POOL_WORKERS']
+    password_verifier.max_pending = app.config['PASSWORD_POOL_MAX_PENDING']
+    password_verifier.method = app.config['PASSWORD_HASH_METHOD']
+    password_verifier.retry_after = app.config['PASSWORD_RETRY_AFTER']
+    import_hasher.workers = app.config['STUDENT_IMPORT_WORKERS']
+    import_hasher.method = app.config['PASSWORD_HASH_METHOD']
+    checkin_table.code_ttl = app.config['CHECKIN_CODE_TTL']
+    checkin_table.window_minutes = app.config['CHECKIN_WINDOW_MINUTES']
+    checkin_buffer.flush_interval = app.config['CHECKIN_FLUSH_INTERVAL']
+    checkin_buffer.batch_size = app.config['CHECKIN_FLUSH_BATCH']
+    checkin_buffer.max_attempts = app.config['CHECKIN_FLUSH_ATTEMPTS']
+    checkin_buffer.start(app)
+
+    bootstrap = app.config['ATTENDANCE_BOOTSTRAP']
+    if bootstrap in ('schema', 'seed'):
+        create_tables(app)
+    if bootstrap == 'seed':
+        with app.app_context():
+            seed_database(
+                app.config['SUPER_ADMIN_EMAIL'],
+                app.config['SUPER_ADMIN_NAME'],
+                app.config['SUPER_ADMIN_PASSWORD']
+            )
+    start_counter_reconciliation(app, app.config['COUNTER_RECONCILE_INTERVAL'])
+
     app.register_blueprint(admin_bp)
     app.register_blueprint(user_bp)
+    app.register_blueprint(student_import_bp)
+    app.register_blueprint(admin_stats_bp)
+    app.register_blueprint(checkin_bp)
+    app.cli.add_command(rebuild_attendance_summary_command)
+    app.cli.add_command(reconcile_counters_command)
+    app.cli.add_command(attendance_report_command)
+    app.cli.add_command(archive_semester_command)
+    app.cli.add_command(seed_command)
     return app
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return load_user_snapshot(int(user_id))
 
 # Ensure instance folder exists
 os.makedirs('instance', exist_ok=True)
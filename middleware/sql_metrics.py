@@ -0,0 +1,279 @@
+"""Per-request SQL and timing metrics.
+
+For a sampled share of requests this records the endpoint, status,
+duration, SQL statement count and time, the slowest statements, rows
+(ORM instances loaded plus rows written), template render time and
+response size. Each sampled response gets a ``Server-Timing`` header.
+The records are kept in a ring buffer that ``/_metrics`` serves as JSON,
+with per-endpoint aggregates.
+
+Requests that are not sampled only pay for a context variable lookup in
+the SQLAlchemy hooks.
+"""
+import contextvars
+import heapq
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import before_render_template, current_app, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Mapper
+
+_current = contextvars.ContextVar('sql_metrics_request', default=None)
+_hooks_installed = False
+_hooks_lock = threading.Lock()
+
+
+class RequestMetrics:
+    """What one sampled request did."""
+
+    def __init__(self, environ, slowest):
+        self.started = time.perf_counter()
+        self.time = datetime.utcnow()
+        self.method = environ.get('REQUEST_METHOD')
+        self.path = environ.get('PATH_INFO')
+        self.endpoint = None
+        self.status = None
+        self.statements = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.render_time = 0.0
+        self.response_bytes = 0
+        self.duration = None
+        self._slowest_size = slowest
+        self._slowest = []
+        self._render_started = None
+
+    def add_statement(self, statement, elapsed, rowcount):
+        self.statements += 1
+        self.db_time += elapsed
+        if rowcount > 0:
+            self.rows += rowcount
+        entry = (elapsed, self.statements, statement)
+        if len(self._slowest) < self._slowest_size:
+            heapq.heappush(self._slowest, entry)
+        elif self._slowest and elapsed > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.statements} queries", '
+            f'render;dur={self.render_time * 1000:.1f}, '
+            f'app;dur={self.elapsed() * 1000:.1f}'
+        )
+
+    def as_dict(self):
+        return {
+            "time": self.time.isoformat(),
+            "method": self.method,
+            "path": self.path,
+            "endpoint": self.endpoint,
+            "status": self.status,
+            "duration_ms": round(self.duration * 1000, 2),
+            "statements": self.statements,
+            "db_ms": round(self.db_time * 1000, 2),
+            "rows": self.rows,
+            "render_ms": round(self.render_time * 1000, 2),
+            "response_bytes": self.response_bytes,
+            "slowest": [
+                {"ms": round(elapsed * 1000, 2), "statement": statement[:500]}
+                for elapsed, _, statement in sorted(self._slowest, reverse=True)
+            ],
+        }
+
+
+class SQLMetrics:
+    """Flask extension collecting `RequestMetrics` for a share of requests.
+
+    Configured from the app config:
+
+    - ``SQL_METRICS_SAMPLE_RATE``: share of requests to record, 0 to 1 (0 turns it off)
+    - ``SQL_METRICS_BUFFER_SIZE``: how many recent requests to keep
+    - ``SQL_METRICS_SLOWEST``: slowest statements kept per request
+
+    `authorize` decides who may read ``/_metrics``; by default only debug apps.
+    SQL hooks are installed on every engine, so they see all binds.
+    """
+
+    def __init__(self, app=None):
+        self.sample_rate = 0.0
+        self.slowest = 5
+        self.records = deque(maxlen=500)
+        self.authorize = lambda: current_app.debug
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.sample_rate = app.config.setdefault('SQL_METRICS_SAMPLE_RATE', 0.0)
+        self.slowest = app.config.setdefault('SQL_METRICS_SLOWEST', 5)
+        self.records = deque(maxlen=app.config.setdefault('SQL_METRICS_BUFFER_SIZE', 500))
+        _install_hooks()
+
+        app.wsgi_app = SQLMetricsMiddleware(app.wsgi_app, self)
+        app.before_request(_record_endpoint)
+        app.after_request(_add_server_timing)
+        before_render_template.connect(_render_started, app)
+        template_rendered.connect(_render_finished, app)
+        app.add_url_rule('/_metrics', 'sql_metrics', self.metrics_view)
+
+    def should_sample(self, environ):
+        return (
+            self.sample_rate > 0
+            and environ.get('PATH_INFO') != '/_metrics'
+            and random.random() < self.sample_rate
+        )
+
+    def finish(self, record):
+        record.duration = record.elapsed()
+        self.records.append(record)
+
+    def summary(self):
+        """Recent requests, newest first, and aggregates per endpoint."""
+        records = [record.as_dict() for record in list(self.records)]
+        endpoints = {}
+        for entry in records:
+            endpoints.setdefault(entry['endpoint'] or entry['path'], []).append(entry)
+
+        def aggregate(entries):
+            durations = sorted(entry['duration_ms'] for entry in entries)
+            return {
+                "requests": len(entries),
+                "p50_ms": durations[len(durations) // 2],
+                "p95_ms": durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+                "avg_statements": round(sum(e['statements'] for e in entries) / len(entries), 2),
+                "avg_db_ms": round(sum(e['db_ms'] for e in entries) / len(entries), 2),
+                "avg_render_ms": round(sum(e['render_ms'] for e in entries) / len(entries), 2),
+            }
+
+        return {
+            "sample_rate": self.sample_rate,
+            "endpoints": {name: aggregate(entries) for name, entries in endpoints.items()},
+            "requests": records[::-1],
+        }
+
+    def metrics_view(self):
+        if not self.authorize():
+            return {"error": "Forbidden"}, 403
+        return self.summary()
+
+
+class SQLMetricsMiddleware:
+    """WSGI layer that starts and finishes `RequestMetrics` around the app.
+
+    The record is finished when the response body is closed, so streamed
+    responses include the queries and bytes of the whole stream.
+    """
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    def __call__(self, environ, start_response):
+        if not self.metrics.should_sample(environ):
+            _current.set(None)
+            return self.app(environ, start_response)
+
+        record = RequestMetrics(environ, self.metrics.slowest)
+        _current.set(record)
+
+        def sampled_start_response(status, headers, exc_info=None):
+            record.status = int(status.split(' ', 1)[0])
+            return start_response(status, headers, exc_info)
+
+        try:
+            body = self.app(environ, sampled_start_response)
+        except BaseException:
+            self._finish(record)
+            raise
+        return _CountingBody(body, record, lambda: self._finish(record))
+
+    def _finish(self, record):
+        _current.set(None)
+        self.metrics.finish(record)
+
+
+class _CountingBody:
+    def __init__(self, body, record, on_close):
+        self.body = body
+        self.record = record
+        self.on_close = on_close
+
+    def __iter__(self):
+        for chunk in self.body:
+            self.record.response_bytes += len(chunk)
+            yield chunk
+
+    def close(self):
+        try:
+            if hasattr(self.body, 'close'):
+                self.body.close()
+        finally:
+            self.on_close()
+
+
+def _install_hooks():
+    global _hooks_installed
+    with _hooks_lock:
+        if _hooks_installed:
+            return
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Mapper, 'load', _instance_loaded)
+        _hooks_installed = True
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault('sql_metrics_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    record = _current.get()
+    if record is None:
+        return
+    started = conn.info.get('sql_metrics_started')
+    if not started:
+        return
+    record.add_statement(statement, time.perf_counter() - started.pop(), cursor.rowcount)
+
+
+def _instance_loaded(target, context):
+    record = _current.get()
+    if record is not None:
+        record.rows += 1
+
+
+def _record_endpoint():
+    record = _current.get()
+    if record is not None:
+        record.endpoint = request.endpoint
+
+
+def _add_server_timing(response):
+    record = _current.get()
+    if record is not None:
+        response.headers['Server-Timing'] = record.server_timing()
+    return response
+
+
+def _render_started(sender, template, context, **extra):
+    record = _current.get()
+    if record is not None:
+        record._render_started = time.perf_counter()
+
+
+def _render_finished(sender, template, context, **extra):
+    record = _current.get()
+    if record is not None and record._render_started is not None:
+        record.render_time += time.perf_counter() - record._render_started
+        record._render_started = None
+
+
+sql_metrics = SQLMetrics()
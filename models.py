@@ -1,31 +1,105 @@
-from datetime import datetime
+from datetime import date, datetime, time as time_of_day
+from flask import g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as FlaskSession
 from sqlalchemy.orm import (
     DeclarativeBase, Mapped, mapped_column,
-    relationship
+    relationship, joinedload, selectinload, validates,
+    Session
 )
 
-from sqlalchemy import create_engine, Integer, Column, String
+import hashlib
+import re
+
+from sqlalchemy import Integer, Column, String, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from flask_login import UserMixin
-from config import config
 from werkzeug.security import generate_password_hash
 
 
 
-db_name = config.SQLALCHEMY_DATABASE_URI
-print(db_name)
-engine = create_engine(db_name, echo=True)
+# Canonical spellings of AttendanceRecord.status
+ATTENDANCE_STATUSES = ('Present', 'Absent', 'Excused')
+# Small integer codes for statuses in archives and analytics; 0 is unknown
+STATUS_CODES = {status: code for code, status in enumerate(ATTENDANCE_STATUSES, start=1)}
+
+def normalize_status(status):
+    """Map any spelling of a status ('present', ' PRESENT ') to its canonical form."""
+    return status.strip().capitalize()
+
+# ClassSession.weekday is an index into this
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+# Length assumed for older sessions whose free-text time has no end
+DEFAULT_SESSION_MINUTES = 60
+
+_SCHEDULE_PATTERN = re.compile(
+    r'^\s*(?P<day>[a-z]{3,9})\.?,?\s+(?P<start>\d{1,2}[:.]\d{2})'
+    r'(?:\s*(?:-|–|to)\s*(?P<end>\d{1,2}[:.]\d{2}))?\s*$',
+    re.IGNORECASE
+)
+
+def format_schedule(weekday, start, end):
+    """Readable form of a schedule, e.g. 'Monday 08:00-10:00'."""
+    return f"{WEEKDAYS[weekday]} {start:%H:%M}-{end:%H:%M}"
+
+def parse_schedule(text):
+    """Parse free text like 'Monday 08:00' or 'Tue 9:30-11:00'.
+
+    Returns ``(weekday, start, end)`` or None if the text isn't understood.
+    """
+    match = _SCHEDULE_PATTERN.match(text or '')
+    if not match:
+        return None
+    day = match['day'].lower()
+    weekday = next((i for i, name in enumerate(WEEKDAYS) if name.lower().startswith(day)), None)
+    try:
+        start = datetime.strptime(match['start'].replace('.', ':'), '%H:%M').time()
+        end = datetime.strptime(match['end'].replace('.', ':'), '%H:%M').time() if match['end'] else None
+    except ValueError:
+        return None
+    if end is None:
+        minutes = min(start.hour * 60 + start.minute + DEFAULT_SESSION_MINUTES, 24 * 60 - 1)
+        end = time_of_day(minutes // 60, minutes % 60)
+    if weekday is None or end <= start:
+        return None
+    return weekday, start, end
 
 class ModelBase(DeclarativeBase):
     pass
 
+# Bind key of the optional read-only database, see database.py
+READ_BIND = 'read'
+
+class RoutingSession(FlaskSession):
+    """Session that sends the reads of read-only views to the read bind.
+
+    Views opt in with `database.read_only`. Flushes and INSERT/UPDATE/DELETE
+    statements always go to the primary, as does everything when no read
+    database is configured.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and not isinstance(clause, UpdateBase)
+            and has_app_context() and g.get('read_only')
+            and READ_BIND in self._db.engines
+        ):
+            return self._db.engines[READ_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
 # Create db instance (but don't initialize yet)
-db = SQLAlchemy(model_class=ModelBase)
+db = SQLAlchemy(model_class=ModelBase, session_options={'class_': RoutingSession})
 
 student_course_table = db.Table(
     'student_course',
     db.Column('student_id', db.Integer, db.ForeignKey('student.id')),
-    db.Column('course_id', db.Integer, db.ForeignKey('course.id'))
+    db.Column('course_id', db.Integer, db.ForeignKey('course.id')),
+    db.Index('ix_student_course_course_student', 'course_id', 'student_id')
 )
 
 lecturer_student_table = db.Table(
@@ -44,6 +118,13 @@ class User(UserMixin, db.Model):
     name: Mapped[str] = mapped_column(db.String(100), nullable=False)
     role: Mapped[str] = mapped_column(db.String(50), nullable=False)
     type: Mapped[str] = mapped_column(db.String(50))
+    # Student or staff number, copied here so login is one indexed lookup.
+    # Unique per role: a staff number may equal some student's number.
+    login_id: Mapped[str] = mapped_column(db.String(50), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_user_login_id_role', 'login_id', 'role', unique=True),
+    )
 
     __mapper_args__ = {
         'polymorphic_identity': 'user',
@@ -73,6 +154,25 @@ class Student(User):
         'polymorphic_identity': 'student',
     }
 
+    @validates('student_number')
+    def validate_student_number(self, key, student_number):
+        self.login_id = student_number
+        return student_number
+
+    @classmethod
+    def profile_options(cls):
+        """Loader options for listings that show department, faculty and level."""
+        return (
+            joinedload(cls.department),
+            joinedload(cls.faculty),
+            joinedload(cls.level),
+        )
+
+    @classmethod
+    def roster_options(cls):
+        """Loader options for listings that also show each student's courses."""
+        return (*cls.profile_options(), selectinload(cls.courses))
+
     def __repr__(self):
         return f"<Student {self.name} ({self.student_number})>"
 
@@ -94,6 +194,11 @@ class Lecturer(User):
         'polymorphic_identity': 'lecturer',
     }
 
+    @validates('staff_number')
+    def validate_staff_number(self, key, staff_number):
+        self.login_id = staff_number
+        return staff_number
+
     def __repr__(self):
         return f"<Lecturer {self.name} ({self.staff_number})>"
 
@@ -162,6 +267,15 @@ class Course(db.Model):
     students = relationship("Student", secondary=student_course_table, back_populates="courses")
     semester = relationship('Semester', back_populates='courses')
 
+    @classmethod
+    def detail_options(cls):
+        """Loader options for listings that show department, lecturer and semester."""
+        return (
+            joinedload(cls.department),
+            joinedload(cls.lecturer),
+            joinedload(cls.semester),
+        )
+
     def __repr__(self):
         return f"<Course {self.name}>"
 
@@ -178,6 +292,13 @@ class Faculty(db.Model):
         return f"<Faculty {self.name}>"
 
 
+def _course_semester(context):
+    """Default AttendanceRecord.semester_id to the semester of its course."""
+    course_id = context.get_current_parameters().get('course_id')
+    if course_id is None:
+        return None
+    return context.connection.scalar(db.select(Course.semester_id).where(Course.id == course_id))
+
 class AttendanceRecord(db.Model):
     __tablename__ = 'attendance_record'
 
@@ -186,18 +307,223 @@ class AttendanceRecord(db.Model):
     course_id: Mapped[int] = mapped_column(db.ForeignKey('course.id'), nullable=False)
     lecturer_id: Mapped[int] = mapped_column(db.ForeignKey('lecturer.id'), nullable=False)
     class_session_id: Mapped[int] = mapped_column(db.ForeignKey('class_session_record.id'), nullable=True)
+    # Copied from the course so records can be split off by semester, see archive.py.
+    # Bulk inserts should pass it rather than pay for a lookup per row.
+    semester_id: Mapped[int] = mapped_column(db.ForeignKey('semester.id'), nullable=True, default=_course_semester)
     
     status: Mapped[str] = mapped_column(db.String(20), nullable=False, default="Present")
     timestamp: Mapped[datetime] = mapped_column(db.DateTime, default=datetime.utcnow)
+    # Calendar day of the timestamp, computed by SQLite so it never needs writing
+    attendance_date: Mapped[date] = mapped_column(
+        db.Date, db.Computed('date(timestamp)', persisted=False), nullable=True
+    )
 
     student = relationship('Student')
     course = relationship('Course')
     lecturer = relationship('Lecturer')
     class_session = relationship('ClassSession', backref='attendance_records')
 
+    __table_args__ = (
+        db.Index('ix_attendance_record_lecturer_timestamp', 'lecturer_id', 'timestamp'),
+        db.Index('ix_attendance_record_student_course_timestamp', 'student_id', 'course_id', 'timestamp'),
+        db.Index('ix_attendance_record_student_timestamp', 'student_id', 'timestamp'),
+        db.Index('ix_attendance_record_student_status', 'student_id', 'status'),
+        db.Index('ix_attendance_record_class_session_student', 'class_session_id', 'student_id'),
+        db.Index('ix_attendance_record_attendance_date_course', 'attendance_date', 'course_id'),
+        db.Index('ix_attendance_record_semester_student', 'semester_id', 'student_id'),
+    )
+
+    @validates('status')
+    def validate_status(self, key, status):
+        return normalize_status(status) if status else status
+
+    @classmethod
+    def table_options(cls):
+        """Loader options for attendance tables showing the student and course.
+
+        Students are fetched with one IN query per page rather than joined into
+        every row, since each one is itself a user/student join.
+        """
+        return (
+            joinedload(cls.course),
+            selectinload(cls.student).options(
+                joinedload(Student.department),
+                joinedload(Student.level),
+            ),
+        )
+
+    @classmethod
+    def course_options(cls):
+        """Loader options for a single student's attendance table."""
+        return (joinedload(cls.course),)
+
     def __repr__(self):
         return f"<AttendanceRecord Student={self.student_id}, Course={self.course_id}, Status={self.status}>"
 
+# One record per student, course and class session per day. Records without
+# a class session are compared as session 0, since NULLs never conflict.
+db.Index(
+    'uq_attendance_record_once_per_day',
+    AttendanceRecord.student_id,
+    AttendanceRecord.course_id,
+    db.func.coalesce(AttendanceRecord.class_session_id, 0),
+    db.func.date(AttendanceRecord.timestamp),
+    unique=True
+)
+
+class AttendanceSummary(db.Model):
+    """Running attendance tallies per student, course and semester.
+
+    Kept up to date by `update_attendance_summary` whenever attendance
+    records are written, so dashboards never have to scan the raw records.
+    `rebuild_attendance_summary` recomputes it from scratch.
+    """
+    __tablename__ = 'attendance_summary'
+
+    student_id: Mapped[int] = mapped_column(db.ForeignKey('student.id'), primary_key=True)
+    course_id: Mapped[int] = mapped_column(db.ForeignKey('course.id'), primary_key=True)
+    semester_id: Mapped[int] = mapped_column(db.ForeignKey('semester.id'), primary_key=True)
+    present_count: Mapped[int] = mapped_column(default=0, nullable=False)
+    absent_count: Mapped[int] = mapped_column(default=0, nullable=False)
+    excused_count: Mapped[int] = mapped_column(default=0, nullable=False)
+    # Timestamp of the latest 'Present' record
+    last_seen_at: Mapped[datetime] = mapped_column(db.DateTime, nullable=True)
+
+    student = relationship('Student')
+    course = relationship('Course')
+    semester = relationship('Semester')
+
+    def __repr__(self):
+        return f"<AttendanceSummary Student={self.student_id}, Course={self.course_id}, Present={self.present_count}>"
+
+SUMMARY_COUNT_COLUMNS = {
+    'Present': 'present_count',
+    'Absent': 'absent_count',
+    'Excused': 'excused_count',
+}
+
+def update_attendance_summary(connection, changes):
+    """Apply attendance record changes to `attendance_summary`.
+
+    `changes` is an iterable of ``(student_id, course_id, semester_id,
+    status, timestamp, delta)`` tuples, where `delta` is 1 for a new record
+    and -1 for a removed one and `semester_id` is the record's own. Records
+    without one count under their course's semester, the one
+    `backfill_attendance_semesters` gives them. Deltas are folded per
+    student, course and semester and written with a single upsert.
+    """
+    changes = list(changes)
+    unknown = {course_id for _, course_id, semester_id, *_ in changes if semester_id is None}
+    course_semesters = dict(connection.execute(
+        db.select(Course.id, Course.semester_id).where(Course.id.in_(unknown))
+    ).all()) if unknown else {}
+
+    totals = {}
+    for student_id, course_id, semester_id, status, timestamp, delta in changes:
+        column = SUMMARY_COUNT_COLUMNS.get(status)
+        if column is None:
+            continue
+        if semester_id is None:
+            semester_id = course_semesters.get(course_id)
+        entry = totals.setdefault((student_id, course_id, semester_id), {
+            'present_count': 0, 'absent_count': 0,
+            'excused_count': 0, 'last_seen_at': None
+        })
+        entry[column] += delta
+        if status == 'Present' and delta > 0 and timestamp is not None:
+            if entry['last_seen_at'] is None or timestamp > entry['last_seen_at']:
+                entry['last_seen_at'] = timestamp
+    if not totals:
+        return
+
+    rows = [
+        dict(student_id=student_id, course_id=course_id, semester_id=semester_id, **entry)
+        for (student_id, course_id, semester_id), entry in totals.items()
+    ]
+
+    stmt = sqlite_insert(AttendanceSummary)
+    current, incoming = AttendanceSummary.last_seen_at, stmt.excluded.last_seen_at
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['student_id', 'course_id', 'semester_id'],
+        set_={
+            **{
+                column: getattr(AttendanceSummary, column) + getattr(stmt.excluded, column)
+                for column in SUMMARY_COUNT_COLUMNS.values()
+            },
+            'last_seen_at': db.case(
+                (incoming.is_(None), current),
+                (current.is_(None), incoming),
+                (incoming > current, incoming),
+                else_=current
+            )
+        }
+    )
+    connection.execute(stmt, rows)
+
+@event.listens_for(Session, 'after_flush')
+def _track_attendance_changes(session, flush_context):
+    changes = []
+    for record in session.new:
+        if isinstance(record, AttendanceRecord):
+            changes.append((record.student_id, record.course_id, record.semester_id,
+                            record.status, record.timestamp, 1))
+    for record in session.deleted:
+        if isinstance(record, AttendanceRecord):
+            changes.append((record.student_id, record.course_id, record.semester_id,
+                            record.status, None, -1))
+    for record in session.dirty:
+        if not isinstance(record, AttendanceRecord):
+            continue
+        attrs = db.inspect(record).attrs
+        status, semester = attrs.status.history, attrs.semester_id.history
+        if not (status.has_changes() or semester.has_changes()):
+            continue
+        # A record moved to another semester leaves that semester's counts too
+        old_semester = next(iter(semester.deleted or semester.unchanged), None)
+        new_semester = next(iter(semester.added or semester.unchanged), None)
+        for old in status.deleted or status.unchanged:
+            changes.append((record.student_id, record.course_id, old_semester, old, None, -1))
+        for new in status.added or status.unchanged:
+            changes.append((record.student_id, record.course_id, new_semester, new, record.timestamp, 1))
+    if changes:
+        update_attendance_summary(session.connection(), changes)
+
+def rebuild_attendance_summary():
+    """Recompute `attendance_summary` from `attendance_record`. Returns the row count.
+
+    Rows are keyed on each record's own semester, or its course's when it
+    has none, as in `update_attendance_summary`. Rows of archived semesters
+    are kept as they are, since their records are no longer in
+    `attendance_record`.
+    """
+    def count_status(status):
+        return db.func.coalesce(db.func.sum(db.case((AttendanceRecord.status == status, 1), else_=0)), 0)
+
+    archived = db.select(AttendanceArchive.semester_id)
+    semester_id = db.func.coalesce(AttendanceRecord.semester_id, Course.semester_id)
+    totals = db.select(
+        AttendanceRecord.student_id,
+        AttendanceRecord.course_id,
+        semester_id,
+        count_status('Present'),
+        count_status('Absent'),
+        count_status('Excused'),
+        db.func.max(db.case((AttendanceRecord.status == 'Present', AttendanceRecord.timestamp)))
+    ).join(Course, AttendanceRecord.course_id == Course.id).where(
+        semester_id.not_in(archived)
+    ).group_by(
+        AttendanceRecord.student_id, AttendanceRecord.course_id, semester_id
+    )
+
+    db.session.execute(db.delete(AttendanceSummary).where(AttendanceSummary.semester_id.not_in(archived)))
+    db.session.execute(db.insert(AttendanceSummary).from_select(
+        ['student_id', 'course_id', 'semester_id', 'present_count',
+         'absent_count', 'excused_count', 'last_seen_at'],
+        totals
+    ))
+    db.session.commit()
+    return db.session.scalar(db.select(db.func.count()).select_from(AttendanceSummary))
+
 class ClassSession(db.Model):
     __tablename__ = 'class_session_record'
 
@@ -213,59 +539,310 @@ class ClassSession(db.Model):
     lecturer: Mapped["Lecturer"] = relationship('Lecturer')
     created_at: Mapped[datetime] = mapped_column(db.DateTime, default=datetime.utcnow)
 
+    # Weekly schedule; `time` keeps its readable form. Sessions created
+    # before these columns existed are filled in by backfill_class_schedules.
+    weekday: Mapped[int] = mapped_column(db.Integer, nullable=True)
+    start_time: Mapped[time_of_day] = mapped_column(db.Time, nullable=True)
+    end_time: Mapped[time_of_day] = mapped_column(db.Time, nullable=True)
+    room: Mapped[str] = mapped_column(db.String(50), nullable=True)
+    semester_id: Mapped[int] = mapped_column(db.ForeignKey('semester.id'), nullable=True)
+    semester: Mapped["Semester"] = relationship('Semester')
+
+    __table_args__ = (
+        db.Index('ix_class_session_record_group_weekday', 'department_id', 'level_id', 'weekday', 'start_time'),
+    )
+
+    @property
+    def is_scheduled(self):
+        return self.weekday is not None and self.start_time is not None and self.end_time is not None
+
     def attendance_for_student(self, student_id):
-        return AttendanceRecord.query.filter_by(class_id=self.id, student_id=student_id).first()
+        """Latest record of `student_id` for this session; use `queries.attendance_matrix` in loops."""
+        return AttendanceRecord.query.filter_by(
+            class_session_id=self.id, student_id=student_id
+        ).order_by(AttendanceRecord.timestamp.desc()).first()
+
+class StudentImportJob(db.Model):
+    """Progress and row errors of a bulk CSV student import."""
+    __tablename__ = 'student_import_job'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    filename: Mapped[str] = mapped_column(db.String(255), nullable=True)
+    status: Mapped[str] = mapped_column(db.String(20), nullable=False, default='queued')
+    processed_rows: Mapped[int] = mapped_column(default=0, nullable=False)
+    imported_rows: Mapped[int] = mapped_column(default=0, nullable=False)
+    failed_rows: Mapped[int] = mapped_column(default=0, nullable=False)
+    # JSON list of {"line": ..., "error": ...}, capped by the importer
+    errors: Mapped[str] = mapped_column(db.Text, nullable=False, default='[]')
+    created_by_id: Mapped[int] = mapped_column(db.ForeignKey('user.id'), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(db.DateTime, default=datetime.utcnow)
+    finished_at: Mapped[datetime] = mapped_column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<StudentImportJob {self.id} ({self.status})>"
+
+class AttendanceArchive(db.Model):
+    """A semester of attendance moved out of `attendance_record` into a read-only file.
+
+    Written by archive.archive_semester; `filename` is relative to
+    ATTENDANCE_ARCHIVE_DIR and the day range lets queries skip the file.
+    """
+    __tablename__ = 'attendance_archive'
+
+    semester_id: Mapped[int] = mapped_column(db.ForeignKey('semester.id'), primary_key=True)
+    filename: Mapped[str] = mapped_column(db.String(255), nullable=False)
+    records: Mapped[int] = mapped_column(nullable=False)
+    first_day: Mapped[date] = mapped_column(db.Date, nullable=True)
+    last_day: Mapped[date] = mapped_column(db.Date, nullable=True)
+    size_bytes: Mapped[int] = mapped_column(nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(db.DateTime, default=datetime.utcnow)
+
+    semester = relationship('Semester')
+
+    def __repr__(self):
+        return f"<AttendanceArchive semester={self.semester_id} ({self.records} records)>"
+
+class DashboardCounter(db.Model):
+    """Precomputed row count shown on the admin dashboard."""
+    __tablename__ = 'dashboard_counter'
+
+    name: Mapped[str] = mapped_column(db.String(50), primary_key=True)
+    value: Mapped[int] = mapped_column(default=0, nullable=False)
+
+# Counter name -> model whose rows it counts
+COUNTED_MODELS = {
+    'students': Student,
+    'lecturers': Lecturer,
+    'departments': Department,
+    'courses': Course,
+}
+
+def adjust_counters(connection, deltas):
+    """Add `deltas` (counter name -> change) to `dashboard_counter` with one upsert.
+
+    ORM inserts and deletes are counted by `_track_counted_rows`; Core bulk
+    writes to a counted table have to call this themselves.
+    """
+    rows = [{'name': name, 'value': delta} for name, delta in deltas.items() if delta]
+    if not rows:
+        return
+    stmt = sqlite_insert(DashboardCounter)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['name'],
+        set_={'value': DashboardCounter.value + stmt.excluded.value}
+    )
+    connection.execute(stmt, rows)
+
+@event.listens_for(Session, 'after_flush')
+def _track_counted_rows(session, flush_context):
+    deltas = dict.fromkeys(COUNTED_MODELS, 0)
+    for objects, delta in ((session.new, 1), (session.deleted, -1)):
+        for obj in objects:
+            for name, model in COUNTED_MODELS.items():
+                if isinstance(obj, model):
+                    deltas[name] += delta
+    adjust_counters(session.connection(), deltas)
+
+def reconcile_counters():
+    """Recompute every dashboard counter with COUNT(*). Returns the counts."""
+    counts = {
+        name: db.session.scalar(db.select(db.func.count()).select_from(model.__table__))
+        for name, model in COUNTED_MODELS.items()
+    }
+    stmt = sqlite_insert(DashboardCounter)
+    stmt = stmt.on_conflict_do_update(index_elements=['name'], set_={'value': stmt.excluded.value})
+    db.session.execute(stmt, [{'name': name, 'value': value} for name, value in counts.items()])
+    db.session.commit()
+    return counts
+
+def dashboard_counts():
+    """Admin dashboard totals, e.g. ``{'total_students': 120, ...}``, from `dashboard_counter`."""
+    values = dict(db.session.execute(db.select(DashboardCounter.name, DashboardCounter.value)).all())
+    return {f'total_{name}': values.get(name, 0) for name in COUNTED_MODELS}
+
+def schema_fingerprint():
+    """Hash of the tables, columns and indexes the models declare.
+
+    Fits in SQLite's 32-bit ``PRAGMA user_version``, where create_tables
+    records the schema it last brought the database up to.
+    """
+    parts = []
+    for table in sorted(db.metadata.sorted_tables, key=lambda t: t.name):
+        columns = ','.join(sorted(column.name for column in table.columns))
+        indexes = ','.join(sorted(index.name for index in table.indexes))
+        parts.append(f"{table.name}({columns})[{indexes}]")
+    return int(hashlib.sha1('|'.join(parts).encode()).hexdigest()[:7], 16)
 
 # Function to create tables
 def create_tables(app):
     with app.app_context():
-        # declarative_base().metadata.create_all(engine)
+        is_sqlite = db.engine.dialect.name == 'sqlite'
+        fingerprint = schema_fingerprint()
+        if is_sqlite and db.session.scalar(db.text('PRAGMA user_version')) == fingerprint:
+            return
+
         db.create_all()
+        add_missing_columns()
+        drop_replaced_indexes()
+        backfill_login_ids()
+        backfill_class_schedules()
+        backfill_attendance_semesters()
+        # create_all skips tables that already exist, so make sure indexes
+        # added after the first run are still created.
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                try:
+                    with db.engine.begin() as connection:
+                        connection.execute(CreateIndex(index, if_not_exists=True))
+                except IntegrityError:
+                    print(f"⚠️ Could not create {index.name}: existing rows violate it.")
+        normalize_attendance_statuses()
+        # Populate the summary the first time it exists alongside older records
+        has_records = db.session.query(AttendanceRecord.query.exists()).scalar()
+        has_summary = db.session.query(AttendanceSummary.query.exists()).scalar()
+        if has_records and not has_summary:
+            rebuild_attendance_summary()
+        if not db.session.query(DashboardCounter.query.exists()).scalar():
+            reconcile_counters()
+        if is_sqlite:
+            db.session.execute(db.text(f'PRAGMA user_version = {fingerprint}'))
+            db.session.commit()
         print("Tables created successfully.")
 
-def create_super_admin(app):
-    """Create a default super admin user."""
-    with app.app_context():
-        create_new_user  = input("Creating new super admin! Press Enter to continue or Q to skip... ")
-        if create_new_user.lower() == "q":
-            return
-        email = input('Email: ')
-        name = input('Name: ')
-        password = input('Password: ')
-        hashed_pw = generate_password_hash(password)
-
-        admin = Admin(
-            email=email,
-            password=hashed_pw,
-            name=name,
-            role='admin',
-            admin_level='super'
+def add_missing_columns():
+    """Add model columns that are missing from tables created by older versions.
+
+    Only suitable for nullable columns; their indexes are created by
+    create_tables afterwards. Generated columns are added as VIRTUAL, so
+    existing rows get their values without a backfill.
+    """
+    inspector = db.inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                if column.computed is not None:
+                    expression = column.computed.sqltext.compile(dialect=db.engine.dialect)
+                    column_type += f' GENERATED ALWAYS AS ({expression}) VIRTUAL'
+                connection.execute(db.text(
+                    f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'
+                ))
+
+# Indexes created by older versions that a differently defined one replaced
+REPLACED_INDEXES = ('ix_user_login_id',)
+
+def drop_replaced_indexes():
+    with db.engine.begin() as connection:
+        for name in REPLACED_INDEXES:
+            connection.execute(db.text(f'DROP INDEX IF EXISTS "{name}"'))
+
+def login_id_taken(login_id):
+    """Whether any user, of any role, already logs in with `login_id`."""
+    return db.session.query(User.query.filter(User.login_id == login_id).exists()).scalar()
+
+def backfill_login_ids():
+    """Copy student and staff numbers into user.login_id where it is missing."""
+    users = User.__table__
+    for table, number in ((Student.__table__, 'student_number'), (Lecturer.__table__, 'staff_number')):
+        db.session.execute(
+            db.update(users)
+            .where(users.c.login_id.is_(None), users.c.type == table.name)
+            .values(login_id=db.select(table.c[number]).where(table.c.id == users.c.id).scalar_subquery())
         )
-        db.session.add(admin)
-        db.session.commit()
-        # if response:
-        print(f"✅ Super admin '{email}' created!")
-
-def create_semester(app):
-    with app.app_context():
-        create_semester = input("Press Enter to create the Semester or Q to skip: ")
-        if create_semester.lower() == "q":
-            return
-        semesters = ['First Semester', 'Second Semester']
-        for name in semesters:
-            if not Semester.query.filter_by(name=name).first():
-                db.session.add(Semester(name=name))
-        db.session.commit()
-        print("✅ Semesters seeded.")
-
-def create_levels(app):
-    with app.app_context():
-        create_levels = input("Press Enter to create the Levels or Q to skip: ")
-        if create_levels.lower() == "q":
-            return
-        levels = ['ND1', 'ND2', 'HND1', 'HND2']
-        for name in levels:
-            if not Level.query.filter_by(name=name).first():
-                db.session.add(Level(name=name))
+    db.session.commit()
+
+def backfill_class_schedules():
+    """Fill in the weekly schedule of class sessions from their free-text time."""
+    sessions = db.session.execute(
+        db.select(ClassSession.id, ClassSession.time).where(ClassSession.weekday.is_(None))
+    ).all()
+    rows = []
+    for session_id, text in sessions:
+        schedule = parse_schedule(text)
+        if schedule:
+            weekday, start, end = schedule
+            rows.append({'id': session_id, 'weekday': weekday, 'start_time': start, 'end_time': end})
+    if rows:
+        db.session.execute(db.update(ClassSession), rows)
+    db.session.commit()
+    return len(rows)
+
+def backfill_attendance_semesters():
+    """Copy each course's semester onto attendance records that have none."""
+    db.session.execute(
+        db.update(AttendanceRecord)
+        .where(AttendanceRecord.semester_id.is_(None))
+        .values(semester_id=db.select(Course.semester_id).where(Course.id == AttendanceRecord.course_id).scalar_subquery())
+    )
+    db.session.commit()
+
+def normalize_attendance_statuses():
+    """Rewrite statuses stored before they were normalized on write."""
+    for status in ATTENDANCE_STATUSES:
+        db.session.execute(
+            db.update(AttendanceRecord)
+            .where(
+                db.func.lower(AttendanceRecord.status) == status.lower(),
+                AttendanceRecord.status != status
+            )
+            .values(status=status)
+        )
+    db.session.commit()
+
+DEFAULT_SEMESTERS = ('First Semester', 'Second Semester')
+DEFAULT_LEVELS = ('ND1', 'ND2', 'HND1', 'HND2')
+
+def create_super_admin(email, name, password):
+    """Create a super admin unless a user with `email` already exists."""
+    if db.session.scalar(db.select(User.id).where(User.email == email)) is not None:
+        return False
+
+    admin = Admin(
+        email=email,
+        password=generate_password_hash(password),
+        name=name,
+        role='admin',
+        admin_level='super'
+    )
+    db.session.add(admin)
+    db.session.commit()
+    print(f"✅ Super admin '{email}' created!")
+    return True
+
+def _seed_names(model, names):
+    """Bulk insert the `names` that `model` doesn't have yet. Returns how many were added."""
+    existing = set(db.session.scalars(db.select(model.name).where(model.name.in_(names))))
+    missing = [{'name': name} for name in names if name not in existing]
+    if missing:
+        db.session.execute(db.insert(model), missing)
         db.session.commit()
-        print("✅ Levels seeded.")
+    return len(missing)
+
+def create_semester(names=DEFAULT_SEMESTERS):
+    created = _seed_names(Semester, names)
+    print("✅ Semesters seeded.")
+    return created
+
+def create_levels(names=DEFAULT_LEVELS):
+    created = _seed_names(Level, names)
+    print("✅ Levels seeded.")
+    return created
+
+def seed_database(admin_email=None, admin_name='Super Admin', admin_password=None):
+    """Seed reference data and, when credentials are given, the super admin.
+
+    Safe to run repeatedly and from several workers at once: existing rows
+    are left alone and a worker that loses an insert race just moves on.
+    """
+    try:
+        create_semester()
+        create_levels()
+        if admin_email and admin_password:
+            create_super_admin(admin_email, admin_name, admin_password)
+    except IntegrityError:
+        db.session.rollback()
@@ -0,0 +1,28 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+class StatementCounter:
+    """Collects the SQL statements executed on an engine."""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@contextmanager
+def count_statements(engine):
+    """Count the statements `engine` executes inside the ``with`` block."""
+    counter = StatementCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask_login import UserMixin
+from sqlalchemy import event
+
+from models import db, User, Course, Department, Level
+
+Ref = namedtuple('Ref', ['id', 'name'])
+
+
+class UserSnapshot(UserMixin):
+    """Detached, read-only copy of a user for flask_login's `current_user`.
+
+    Carries what the views read on every request (role, ids, department,
+    level and courses) so serving a cached user needs no database access.
+    Views that need to modify the user should load the model instead.
+    """
+
+    def __init__(self, user):
+        self.id = user.id
+        self.email = user.email
+        self.name = user.name
+        self.role = user.role
+        self.type = user.type
+        self.student_number = getattr(user, 'student_number', None)
+        self.staff_number = getattr(user, 'staff_number', None)
+        self.admin_level = getattr(user, 'admin_level', None)
+        self.faculty_id = getattr(user, 'faculty_id', None)
+        self.department_id = getattr(user, 'department_id', None)
+        self.level_id = getattr(user, 'level_id', None)
+
+        department = getattr(user, 'department', None)
+        level = getattr(user, 'level', None)
+        self.department = Ref(department.id, department.name) if department else None
+        self.level = Ref(level.id, level.name) if level else None
+        self.courses = tuple(Ref(c.id, c.name) for c in getattr(user, 'courses', ()))
+
+    @property
+    def course_ids(self):
+        return [course.id for course in self.courses]
+
+    def __repr__(self):
+        return f"<UserSnapshot {self.email} ({self.role})>"
+
+
+class UserCache:
+    """Thread-safe LRU cache of `UserSnapshot`s with a time-to-live.
+
+    The TTL bounds how stale a snapshot can get when another worker process
+    changes the user; changes made in this process invalidate it at once.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires, snapshot = entry
+            if expires < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return snapshot
+
+    def put(self, snapshot):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[snapshot.id] = (time.monotonic() + self.ttl, snapshot)
+            self._entries.move_to_end(snapshot.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id=None):
+        """Drop one user, or every user when `user_id` is None."""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+
+user_cache = UserCache()
+
+
+def load_user_snapshot(user_id):
+    snapshot = user_cache.get(user_id)
+    if snapshot is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        snapshot = UserSnapshot(user)
+        user_cache.put(snapshot)
+    return snapshot
+
+
+@event.listens_for(User, 'after_update', propagate=True)
+@event.listens_for(User, 'after_delete', propagate=True)
+def _invalidate_user(mapper, connection, target):
+    # Also fires for students whose course list changed
+    user_cache.invalidate(target.id)
+
+
+@event.listens_for(Course, 'after_insert')
+@event.listens_for(Course, 'after_update')
+@event.listens_for(Course, 'after_delete')
+@event.listens_for(Department, 'after_update')
+@event.listens_for(Department, 'after_delete')
+@event.listens_for(Level, 'after_update')
+@event.listens_for(Level, 'after_delete')
+def _invalidate_all_users(mapper, connection, target):
+    # Course assignments and names are copied into many snapshots
+    user_cache.invalidate()
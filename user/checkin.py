@@ -0,0 +1,329 @@
+import atexit
+import secrets
+import threading
+import time
+from collections import defaultdict
+
+from flask import Blueprint, request, abort
+from flask_login import login_required, current_user
+from sqlalchemy.exc import IntegrityError
+
+from models import db, ClassSession
+from .queries import course_student_ids, lecturer_session_for_course
+from .services import mark_attendance_bulk
+
+checkin_bp = Blueprint('checkin', __name__, url_prefix='/check-in')
+
+# No 0/O or 1/I, so codes read off a projector can't be mistyped
+CODE_ALPHABET = '23456789ABCDEFGHJKLMNPQRSTUVWXYZ'
+CODE_LENGTH = 6
+
+ACCEPTED = 'accepted'
+DUPLICATE = 'already_checked_in'
+NOT_ENROLLED = 'not_enrolled'
+INVALID = 'invalid'
+
+
+class CheckInWindow:
+    """An open check-in for one class session, saved against `course_id`."""
+
+    def __init__(self, class_session_id, course_id, lecturer_id, roster, closes_at):
+        self.class_session_id = class_session_id
+        self.course_id = course_id
+        self.lecturer_id = lecturer_id
+        self.roster = frozenset(roster)
+        self.checked_in = set()
+        self.closes_at = closes_at
+        self.code = None
+        self.previous_code = None
+        self.code_expires = 0.0
+
+
+class CheckInTable:
+    """Open check-in windows and their rotating codes, held in memory.
+
+    Codes rotate every `code_ttl` seconds; the previous code stays valid
+    for one more period so a student who read it just before a rotation
+    isn't turned away. Each code maps straight to its window and the
+    window holds the course roster, so checking a student in is a few dict
+    and set lookups with no database access. Windows close by themselves
+    after `window_minutes`; ones nobody asks about again are purged the
+    next time a window opens, so the table only holds recent classes.
+
+    The table is per process: run check-in on a single worker, or route
+    each class to the same one.
+    """
+
+    def __init__(self, code_ttl=30, window_minutes=15):
+        self.code_ttl = code_ttl
+        self.window_minutes = window_minutes
+        self._windows = {}
+        self._codes = {}
+        self._lock = threading.Lock()
+
+    def open(self, class_session_id, course_id, lecturer_id, roster):
+        """Open (or restart) check-in for a class session and return its window."""
+        now = time.monotonic()
+        window = CheckInWindow(class_session_id, course_id, lecturer_id, roster,
+                               closes_at=now + self.window_minutes * 60)
+        with self._lock:
+            self._purge(now)
+            self._close(class_session_id)
+            self._windows[class_session_id] = window
+            self._rotate(window, now)
+        return window
+
+    def purge(self):
+        """Close every window past its closing time. Returns how many were closed."""
+        with self._lock:
+            return self._purge(time.monotonic())
+
+    def close(self, class_session_id):
+        with self._lock:
+            return self._close(class_session_id)
+
+    def current_code(self, class_session_id):
+        """Return ``(code, seconds_left)`` for an open window, or None."""
+        now = time.monotonic()
+        with self._lock:
+            window = self._live_window(self._windows.get(class_session_id), now)
+            if window is None:
+                return None
+            return window.code, window.code_expires - now
+
+    def check_in(self, code, student_id):
+        """Check `student_id` in with `code`. Returns ``(result, window)``."""
+        now = time.monotonic()
+        code = (code or '').strip().upper()
+        with self._lock:
+            window = self._live_window(self._codes.get(code), now)
+            if window is None or code not in (window.code, window.previous_code):
+                return INVALID, None
+            if student_id not in window.roster:
+                return NOT_ENROLLED, window
+            if student_id in window.checked_in:
+                return DUPLICATE, window
+            window.checked_in.add(student_id)
+            return ACCEPTED, window
+
+    def _live_window(self, window, now):
+        if window is None:
+            return None
+        if now >= window.closes_at:
+            self._close(window.class_session_id)
+            return None
+        if now >= window.code_expires:
+            self._rotate(window, now)
+        return window
+
+    def _purge(self, now):
+        expired = [key for key, window in self._windows.items() if now >= window.closes_at]
+        for class_session_id in expired:
+            self._close(class_session_id)
+        return len(expired)
+
+    def _rotate(self, window, now):
+        self._codes.pop(window.previous_code, None)
+        # A code more than one period old is no longer honoured
+        if now >= window.code_expires + self.code_ttl:
+            self._codes.pop(window.code, None)
+            window.previous_code = None
+        else:
+            window.previous_code = window.code
+
+        code = self._new_code()
+        self._codes[code] = window
+        window.code = code
+        window.code_expires = now + self.code_ttl
+
+    def _new_code(self):
+        while True:
+            code = ''.join(secrets.choice(CODE_ALPHABET) for _ in range(CODE_LENGTH))
+            if code not in self._codes:
+                return code
+
+    def _close(self, class_session_id):
+        window = self._windows.pop(class_session_id, None)
+        if window is not None:
+            self._codes.pop(window.code, None)
+            self._codes.pop(window.previous_code, None)
+        return window
+
+
+class CheckInBuffer:
+    """Write-behind queue that saves accepted check-ins in batches.
+
+    Check-ins are grouped per class and written with `mark_attendance_bulk`,
+    one executemany and commit per class, by a background thread every
+    `flush_interval` seconds or as soon as `batch_size` are waiting. A
+    class whose batch fails stays queued for up to `max_attempts` flushes;
+    one that breaks a constraint (say its class session was deleted) can
+    never be saved and is dropped at once. Dropped check-ins are logged
+    with their student ids so the lecturer can mark them by hand.
+    """
+
+    def __init__(self, flush_interval=1.0, batch_size=200, max_attempts=5):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self._pending = []
+        self._attempts = defaultdict(int)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._app = None
+        self._thread = None
+
+    def start(self, app):
+        self._app = app
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='checkin-flush', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def add(self, window, student_id):
+        with self._lock:
+            self._pending.append(((window.lecturer_id, window.course_id, window.class_session_id), student_id))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Save everything queued so far. Returns the number of records created."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending or self._app is None:
+            return 0
+
+        classes = defaultdict(dict)
+        for key, student_id in pending:
+            classes[key][student_id] = 'Present'
+
+        created = 0
+        with self._app.app_context():
+            for (lecturer_id, course_id, class_session_id), statuses in classes.items():
+                key = (lecturer_id, course_id, class_session_id)
+                try:
+                    created += mark_attendance_bulk(lecturer_id, course_id, statuses, class_session_id)
+                except Exception as exc:
+                    db.session.rollback()
+                    with self._lock:
+                        self._attempts[key] += 1
+                        attempts = self._attempts[key]
+                        retry = not isinstance(exc, IntegrityError) and attempts < self.max_attempts
+                        if retry:
+                            self._pending.extend((key, student_id) for student_id in statuses)
+                        else:
+                            del self._attempts[key]
+                    if retry:
+                        print(f"⚠️ Could not save {len(statuses)} check-ins (attempt {attempts}), will retry: {exc}")
+                    else:
+                        print(f"❌ Dropped {len(statuses)} check-ins for class session {class_session_id} "
+                              f"after {attempts} attempt(s), students {sorted(statuses)}: {exc}")
+                else:
+                    with self._lock:
+                        self._attempts.pop(key, None)
+        return created
+
+
+checkin_table = CheckInTable()
+checkin_buffer = CheckInBuffer()
+
+
+def _lecturer_session(class_session_id):
+    if current_user.role != 'lecturer':
+        abort(403)
+    lecturer_id = db.session.scalar(
+        db.select(ClassSession.lecturer_id).where(ClassSession.id == class_session_id)
+    )
+    if lecturer_id != current_user.id:
+        abort(404)
+
+
+def _payload():
+    """The request's JSON object, or its form data; any other JSON body is a 400."""
+    payload = request.get_json(silent=True)
+    if payload is None:
+        return request.form
+    if not isinstance(payload, dict):
+        abort(400)
+    return payload
+
+
+@checkin_bp.route('/sessions/<int:class_session_id>/open', methods=['POST'])
+@login_required
+def open_check_in(class_session_id):
+    """Start check-in for a class session; expects ``course_id`` as JSON or form data."""
+    _lecturer_session(class_session_id)
+    payload = _payload()
+    try:
+        course_id = int(payload.get('course_id'))
+    except (TypeError, ValueError):
+        abort(400)
+    if course_id not in current_user.course_ids:
+        abort(403)
+    if lecturer_session_for_course(class_session_id, course_id, current_user.id) is None:
+        abort(403)
+
+    window = checkin_table.open(class_session_id, course_id, current_user.id,
+                                course_student_ids(course_id))
+    return {
+        "class_session_id": class_session_id,
+        "code": window.code,
+        "expires_in": checkin_table.code_ttl,
+        "closes_in": checkin_table.window_minutes * 60,
+        "enrolled": len(window.roster)
+    }
+
+
+@checkin_bp.route('/sessions/<int:class_session_id>/code')
+@login_required
+def check_in_code(class_session_id):
+    """Current code to show in class; poll it to follow the rotation."""
+    _lecturer_session(class_session_id)
+    current = checkin_table.current_code(class_session_id)
+    if current is None:
+        abort(404)
+    code, expires_in = current
+    return {"code": code, "expires_in": round(expires_in, 1)}
+
+
+@checkin_bp.route('/sessions/<int:class_session_id>/close', methods=['POST'])
+@login_required
+def close_check_in(class_session_id):
+    _lecturer_session(class_session_id)
+    window = checkin_table.close(class_session_id)
+    if window is None:
+        abort(404)
+    checkin_buffer.flush()
+    return {"checked_in": len(window.checked_in), "enrolled": len(window.roster)}
+
+
+@checkin_bp.route('', methods=['POST'])
+@login_required
+def check_in():
+    """Check the current student in with a code; expects ``code`` as JSON or form data."""
+    if current_user.role != 'student':
+        abort(403)
+    code = _payload().get('code')
+    if not isinstance(code, str):
+        return {"error": "A check-in code is required"}, 400
+    result, window = checkin_table.check_in(code, current_user.id)
+    if result == INVALID:
+        return {"error": "Invalid or expired code"}, 400
+    if result == NOT_ENROLLED:
+        return {"error": "You are not enrolled in this course"}, 403
+    if result == DUPLICATE:
+        return {"status": result}, 200
+
+    checkin_buffer.add(window, current_user.id)
+    return {"status": result}, 202
@@ -0,0 +1,56 @@
+import csv
+import io
+import tempfile
+
+try:
+    from openpyxl import Workbook
+except ImportError:
+    Workbook = None
+
+from models import db
+from .queries import EXPORT_COLUMNS
+
+BATCH_SIZE = 1000
+
+
+def _export_rows(stmts):
+    """Yield the rows of each of `stmts` in turn, fetching them `BATCH_SIZE` at a time."""
+    for stmt in stmts:
+        result = db.session.execute(stmt.execution_options(yield_per=BATCH_SIZE))
+        for timestamp, *values, status in result:
+            yield (timestamp.strftime('%Y-%m-%d'), *values, status)
+
+
+def iter_csv(stmts):
+    """Yield the rows of `stmts` as CSV text, one chunk per database batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+
+    for count, row in enumerate(_export_rows(stmts), start=1):
+        writer.writerow(row)
+        if count % BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_xlsx(stmts, chunk_size=64 * 1024):
+    """Yield the rows of `stmts` as an XLSX workbook.
+
+    An XLSX file is a zip archive, so it can only be sent once complete. A
+    write-only workbook keeps memory flat while building it in a temporary
+    file, which is then streamed out in chunks.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Attendance')
+    sheet.append(EXPORT_COLUMNS)
+    for row in _export_rows(stmts):
+        sheet.append(row)
+
+    with tempfile.TemporaryFile() as target:
+        workbook.save(target)
+        target.seek(0)
+        while chunk := target.read(chunk_size):
+            yield chunk
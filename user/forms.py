@@ -1,12 +1,54 @@
+from itertools import chain
+
 from flask_wtf import FlaskForm
 from wtforms import (
     SelectField, SelectMultipleField,
     PasswordField, SubmitField,
-    StringField
+    StringField, TimeField
 )
-from wtforms.validators import DataRequired
-from wtforms_sqlalchemy.fields import QuerySelectField
-from models import Department, Level
+from sqlalchemy import event
+from wtforms.validators import DataRequired, Length, Optional, ValidationError
+from wtforms_sqlalchemy.fields import QuerySelectField, QueryChoices
+from models import db, Department, Level, Semester, WEEKDAYS
+
+class IndexedSelectMultipleField(SelectMultipleField):
+    """SelectMultipleField that checks submitted values against a set.
+
+    WTForms compares every submitted value with a list of all choices,
+    which gets quadratic when hundreds of students are ticked at once.
+    The set is built from `choices` directly, as `iter_choices` also
+    searches the submitted values for every choice.
+    """
+
+    def choice_values(self):
+        """Coerced values of every choice, flattening grouped choices."""
+        choices = self.choices
+        if isinstance(choices, dict):
+            choices = list(chain.from_iterable(choices.values()))
+        if not choices:
+            return set()
+        if isinstance(choices[0], (list, tuple)):
+            return {self.coerce(choice[0]) for choice in choices}
+        return {self.coerce(choice) for choice in choices}
+
+    def pre_validate(self, form):
+        if not self.validate_choice or not self.data:
+            return
+        if self.choices is None:
+            raise TypeError(self.gettext("Choices cannot be None."))
+
+        acceptable = self.choice_values()
+        unacceptable = [str(data) for data in dict.fromkeys(self.data) if data not in acceptable]
+        if unacceptable:
+            raise ValidationError(
+                self.ngettext(
+                    "'%(value)s' is not a valid choice for this field.",
+                    "'%(value)s' are not valid choices for this field.",
+                    len(unacceptable),
+                )
+                % dict(value="', '".join(unacceptable))
+            )
+
 
 class LoginForm(FlaskForm):
     matric_number = StringField('Matric Number', validators=[DataRequired()])
@@ -18,22 +60,38 @@ class LoginForm(FlaskForm):
     submit = SubmitField("Login")
 
 
-class AttendanceForm(FlaskForm):
-    course_id = SelectField('Course', coerce=int, validators=[DataRequired()])
-    student_ids = SelectMultipleField('Students', coerce=int, validators=[DataRequired()])
-    status = SelectField('Status', choices=[('Present', 'Present'), ('Absent', 'Absent'), ('Excused', 'Excused')], validators=[DataRequired()])
-    submit = SubmitField('Mark Attendance')
+def reference_choices(model):
+    """Cached choices for a small reference table, reloaded when it changes.
 
-def department_choices():
-    return Department.query.all()
+    Rows are loaded in a throwaway session so the cached objects never get
+    expired by a request's commit; the one a form returns is merged into
+    the request's session without a query.
+    """
+    def load():
+        with db.session.session_factory() as session:
+            return session.scalars(db.select(model)).all()
 
-def level_choices():
-    return Level.query.all()
+    choices = QueryChoices(load, get_object=lambda obj: db.session.merge(obj, load=False))
+    for name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(model, name, lambda mapper, connection, target: choices.invalidate())
+    return choices
+
+department_choices = reference_choices(Department)
+level_choices = reference_choices(Level)
+semester_choices = reference_choices(Semester)
+REFERENCE_CHOICES = (department_choices, level_choices, semester_choices)
 
 class CreateClassForm(FlaskForm):
     course_code = StringField('Course Code', validators=[DataRequired()])
     title = StringField('Title', validators=[DataRequired()])
-    time = StringField('Time', validators=[DataRequired()])
+    weekday = SelectField('Day', coerce=int, choices=list(enumerate(WEEKDAYS)))
+    start_time = TimeField('Starts', validators=[DataRequired()])
+    end_time = TimeField('Ends', validators=[DataRequired()])
+    room = StringField('Room', validators=[Optional(), Length(max=50)])
+    semester = QuerySelectField(
+        'Semester', query_factory=semester_choices,
+        get_label='name', allow_blank=True, blank_text='Any semester'
+    )
     department = QuerySelectField(
         'Department', query_factory=department_choices,
         get_label='name', allow_blank=False,
@@ -46,9 +104,13 @@ class CreateClassForm(FlaskForm):
     )
     submit = SubmitField('Create Class')
 
+    def validate_end_time(self, field):
+        if self.start_time.data and field.data and field.data <= self.start_time.data:
+            raise ValidationError("A class must end after it starts.")
+
 
 class AttendanceForm(FlaskForm):
     course_id = SelectField('Course', coerce=int, validators=[DataRequired()])
-    student_ids = SelectMultipleField('Students', coerce=int, validators=[DataRequired()])
-    status = SelectField('Status', choices=[('present', 'Present'), ('absent', 'Absent')], validators=[DataRequired()])
+    student_ids = IndexedSelectMultipleField('Students', coerce=int, validators=[DataRequired()])
+    status = SelectField('Status', choices=[('Present', 'Present'), ('Absent', 'Absent')], validators=[DataRequired()])
     submit = SubmitField('Mark Attendance')  # ✅ REQUIRED
\ No newline at end of file
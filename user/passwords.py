@@ -0,0 +1,115 @@
+import os
+import threading
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when too many password hashes are already queued or running."""
+
+
+class PasswordVerifier:
+    """Runs password hashing in a bounded process pool.
+
+    scrypt pins a core and ~32MB per check, so a burst of logins on the
+    request threads starves everything else. Here at most `max_pending`
+    checks are queued or running at once; callers past that get
+    `PasswordPoolBusy` straight away and should ask the client to retry.
+    With `workers` set to 0 hashing runs on the calling thread.
+
+    `method` is the cost profile new hashes use, as passed to
+    `generate_password_hash` (e.g. ``scrypt`` or ``scrypt:32768:8:1``).
+    Hashes using any other profile are upgraded on the next successful
+    login.
+    """
+
+    def __init__(self, workers=None, max_pending=32, timeout=30,
+                 method='scrypt:32768:8:1', retry_after=5):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.method = method
+        self.retry_after = retry_after
+        self._stored_method = None
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers or os.cpu_count())
+            return self._executor
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def _run(self, func, *args):
+        if self.workers == 0:
+            return func(*args)
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise PasswordPoolBusy()
+            self._pending += 1
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BrokenProcessPool:
+            self._release(None)
+            self.shutdown()
+            raise PasswordPoolBusy() from None
+        # The slot is freed when the work finishes, not when we stop waiting
+        future.add_done_callback(self._release)
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise PasswordPoolBusy() from None
+        except BrokenProcessPool:
+            self.shutdown()
+            raise PasswordPoolBusy() from None
+
+    def check(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def hash_many(self, passwords):
+        """Hash a batch of passwords across the pool, ignoring the queue cap.
+
+        Meant for bulk jobs that own their verifier, not the shared login one.
+        """
+        if self.workers == 0:
+            return [generate_password_hash(password, self.method) for password in passwords]
+        chunksize = max(1, len(passwords) // ((self.workers or os.cpu_count()) * 4))
+        return list(self._get_executor().map(
+            generate_password_hash, passwords, repeat(self.method), chunksize=chunksize
+        ))
+
+    def stored_method(self):
+        """`method` the way werkzeug writes it into hashes, defaults filled in.
+
+        ``scrypt`` is stored as ``scrypt:32768:8:1``, so the prefix is
+        taken from hashing an empty password once per configured method.
+        """
+        method, cached = self.method, self._stored_method
+        if cached is None or cached[0] != method:
+            cached = self._stored_method = (method, generate_password_hash('', method).split('$', 1)[0])
+        return cached[1]
+
+    def needs_rehash(self, pwhash):
+        return pwhash.split('$', 1)[0] != self.stored_method()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_verifier = PasswordVerifier()
@@ -0,0 +1,314 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, case, func, or_, select, tuple_
+
+from archive import attendance_history
+from models import (
+    db, AttendanceSummary, ClassSession,
+    Student, Department, Level, Course, student_course_table
+)
+
+PAGE_SIZE = 50
+
+
+def day_range(day):
+    """Return the half-open ``[start, end)`` timestamps covering the date `day`.
+
+    Comparing the bare timestamp column against these lets SQLite use an
+    index, which ``date(timestamp) == day`` never can.
+    """
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
+
+
+def lecturer_attendance_queries(lecturer_id, department_id=None, level_id=None,
+                                course_id=None, date=None, search=None, before=None):
+    """Yield the selects behind the lecturer records page, archived semesters included.
+
+    Rows have the record's id, timestamp and status, the student's name,
+    student_number, department and level, and the course. `before` is a
+    ``(timestamp, id)`` position from `decode_cursor`: only older records
+    are selected and archives starting after it are left out. Run each
+    select before taking the next, see `attendance_history`.
+    """
+    end = date
+    if before:
+        end = min(date, before[0].date()) if date else before[0].date()
+    for history in attendance_history(
+        db.session.connection(), lecturer_id=lecturer_id, course_id=course_id, start=date, end=end
+    ):
+        stmt = _with_students(
+            select(
+                history.c.id,
+                history.c.timestamp,
+                history.c.status,
+                Student.name,
+                Student.student_number,
+                Department.name.label('department'),
+                Level.name.label('level'),
+                Course.name.label('course')
+            ),
+            history, department_id, level_id, search
+        )
+        if before:
+            timestamp, record_id = before
+            stmt = stmt.where(or_(
+                history.c.timestamp < timestamp,
+                and_(history.c.timestamp == timestamp, history.c.id < record_id)
+            ))
+        yield stmt
+
+
+def student_attendance_queries(student_id, semester_id=None, course_id=None, date=None):
+    """Yield the selects of a student's own attendance, archived semesters included.
+
+    Rows have the record's id, timestamp and status and the course name.
+    Run each select before taking the next, see `attendance_history`.
+    """
+    for history in attendance_history(
+        db.session.connection(), student_id=student_id, semester_id=semester_id,
+        course_id=course_id, start=date, end=date
+    ):
+        yield (
+            select(history.c.id, history.c.timestamp, history.c.status, Course.name.label('course_name'))
+            .join(Course, history.c.course_id == Course.id)
+        )
+
+
+def student_attendance(student_id, semester_id=None, course_id=None, date=None):
+    """Return a student's own attendance rows, newest first."""
+    records = [
+        row
+        for stmt in student_attendance_queries(student_id, semester_id, course_id, date)
+        for row in db.session.execute(stmt).all()
+    ]
+    records.sort(key=lambda row: (row.timestamp, row.id), reverse=True)
+    return records
+
+
+def attendance_summary(stmts):
+    """Return total/present/absent counts over the rows of `stmts`, one SELECT each."""
+    summary = {'total': 0, 'present': 0, 'absent': 0}
+    for stmt in stmts:
+        rows = stmt.subquery()
+        total, present, absent = db.session.execute(select(
+            func.count(),
+            _count_status(rows.c.status, 'Present'),
+            _count_status(rows.c.status, 'Absent'),
+        )).one()
+        summary['total'] += total
+        summary['present'] += present
+        summary['absent'] += absent
+    return summary
+
+
+def _count_status(column, status):
+    return func.coalesce(func.sum(case((column == status, 1), else_=0)), 0)
+
+
+def student_dashboard_stats(student):
+    """Return the student dashboard counters in one round-trip.
+
+    Counts come from `attendance_summary`, one row per course, so the cost
+    doesn't grow with the student's history. The class count is a scalar
+    subquery so the statement always yields a single row, even for a
+    student with no attendance yet.
+    """
+    total_classes = select(func.count(ClassSession.id)).where(
+        ClassSession.department_id == student.department_id,
+        ClassSession.level_id == student.level_id
+    ).scalar_subquery()
+
+    total_classes, attended, missed = db.session.execute(
+        select(
+            total_classes,
+            func.coalesce(func.sum(AttendanceSummary.present_count), 0),
+            func.coalesce(func.sum(AttendanceSummary.absent_count), 0),
+        ).where(AttendanceSummary.student_id == student.id)
+    ).one()
+
+    percentage = (attended / total_classes * 100) if total_classes > 0 else 0
+    return {
+        'attended': attended,
+        'missed': missed,
+        'percentage': int(percentage),
+        'total_classes': total_classes
+    }
+
+
+def encode_cursor(record):
+    return f"{record.timestamp.isoformat()}_{record.id}"
+
+
+def decode_cursor(cursor):
+    timestamp, _, record_id = cursor.rpartition('_')
+    return datetime.fromisoformat(timestamp), int(record_id)
+
+
+def paginate_attendance(stmts, per_page=PAGE_SIZE):
+    """Keyset-paginate the rows of `stmts` newest first.
+
+    Each select is read up to a page past its cursor, from
+    `lecturer_attendance_queries` called with ``before=decode_cursor(cursor)``,
+    and the pages are merged. Returns the page of records and the cursor
+    for the next page, or ``None`` when there are no more records.
+    """
+    records = []
+    for stmt in stmts:
+        columns = stmt.selected_columns
+        records.extend(db.session.execute(
+            stmt.order_by(columns.timestamp.desc(), columns.id.desc()).limit(per_page + 1)
+        ).all())
+    records.sort(key=lambda record: (record.timestamp, record.id), reverse=True)
+
+    next_cursor = None
+    if len(records) > per_page:
+        records = records[:per_page]
+        next_cursor = encode_cursor(records[-1])
+    return records, next_cursor
+
+
+EXPORT_COLUMNS = ('Date', 'Name', 'Matric No.', 'Department', 'Level', 'Course', 'Status')
+
+
+def attendance_export_queries(lecturer_id=None, course_id=None, department_id=None,
+                              level_id=None, start=None, end=None, search=None):
+    """Yield the selects of the flat rows of an attendance export, oldest first.
+
+    Only plain columns are selected so rows can be streamed without building
+    ORM objects. `start` and `end` are inclusive dates. Archived semesters
+    are included, a batch of them per select in semester order; run each
+    select before taking the next, see `attendance_history`.
+    """
+    for history in attendance_history(
+        db.session.connection(), lecturer_id=lecturer_id, course_id=course_id, start=start, end=end
+    ):
+        yield _with_students(
+            select(
+                history.c.timestamp,
+                Student.name,
+                Student.student_number,
+                Department.name.label('department'),
+                Level.name.label('level'),
+                Course.name.label('course'),
+                history.c.status
+            ),
+            history, department_id, level_id, search
+        ).order_by(history.c.timestamp, history.c.id)
+
+
+def _with_students(stmt, history, department_id, level_id, search):
+    """Join the student, course, department and level of `history` rows and filter on the student."""
+    stmt = (
+        stmt.select_from(history)
+        .join(Student, history.c.student_id == Student.id)
+        .join(Course, history.c.course_id == Course.id)
+        .outerjoin(Department, Student.department_id == Department.id)
+        .outerjoin(Level, Student.level_id == Level.id)
+    )
+    if department_id:
+        stmt = stmt.where(Student.department_id == department_id)
+    if level_id:
+        stmt = stmt.where(Student.level_id == level_id)
+    if search:
+        pattern = f"%{search}%"
+        stmt = stmt.where(or_(Student.name.ilike(pattern), Student.student_number.ilike(pattern)))
+    return stmt
+
+
+def course_roster(course_id):
+    """Return ``(id, name, student_number)`` rows for students enrolled in a course."""
+    return db.session.execute(
+        select(Student.id, Student.name, Student.student_number)
+        .join(student_course_table, student_course_table.c.student_id == Student.id)
+        .where(student_course_table.c.course_id == course_id)
+        .order_by(Student.name)
+    ).all()
+
+
+def course_student_ids(course_id):
+    """Return the ids of every student enrolled in `course_id`."""
+    return set(db.session.scalars(
+        select(student_course_table.c.student_id).where(student_course_table.c.course_id == course_id)
+    ))
+
+
+def enrolled_student_ids(course_id, student_ids):
+    """Return the subset of `student_ids` enrolled in `course_id`."""
+    return set(db.session.scalars(
+        select(student_course_table.c.student_id).where(
+            student_course_table.c.course_id == course_id,
+            student_course_table.c.student_id.in_(student_ids)
+        )
+    ))
+
+
+def lecturer_session_for_course(class_session_id, course_id, lecturer_id):
+    """Return the lecturer's class session if it can belong to `course_id`, else None.
+
+    Sessions carry no course of their own, so one belongs to a course when
+    it is for the course's department and, if it names one, its semester.
+    """
+    return db.session.scalar(
+        select(ClassSession)
+        .join(Course, Course.id == course_id)
+        .where(
+            ClassSession.id == class_session_id,
+            ClassSession.lecturer_id == lecturer_id,
+            ClassSession.department_id == Course.department_id,
+            or_(ClassSession.semester_id.is_(None), ClassSession.semester_id == Course.semester_id)
+        )
+    )
+
+
+def attendance_matrix(session_ids, student_ids):
+    """Return ``{session_id: {student_id: status}}`` for every pair, from one query.
+
+    Pairs without a record map to None. When a student has several records
+    for a session (one per day) the latest one wins. Archived semesters are
+    included, one select per batch, see `attendance_history`.
+    """
+    matrix = {session_id: dict.fromkeys(student_ids) for session_id in session_ids}
+    if not matrix or not student_ids:
+        return matrix
+
+    # A single student's history is read along their own index
+    student_id = next(iter(student_ids)) if len(student_ids) == 1 else None
+    rows = []
+    for history in attendance_history(
+        db.session.connection(), student_id=student_id, class_session_ids=list(matrix)
+    ):
+        rows.extend(db.session.execute(
+            select(history.c.class_session_id, history.c.student_id, history.c.status,
+                   history.c.timestamp, history.c.id)
+            .where(history.c.student_id.in_(student_ids))
+        ).all())
+    rows.sort(key=lambda row: (row.timestamp, row.id))
+    for row in rows:
+        matrix[row.class_session_id][row.student_id] = row.status
+    return matrix
+
+
+def session_roster(sessions):
+    """Return ``(id, name, student_number)`` rows for the students the class sessions are for."""
+    groups = {(session.department_id, session.level_id) for session in sessions}
+    if not groups:
+        return []
+    return db.session.execute(
+        select(Student.id, Student.name, Student.student_number)
+        .where(tuple_(Student.department_id, Student.level_id).in_(groups))
+        .order_by(Student.name)
+    ).all()
+
+
+def serialize_record(record):
+    return {
+        "id": record.id,
+        "name": record.name,
+        "student_number": record.student_number,
+        "department": record.department,
+        "level": record.level,
+        "course": record.course,
+        "date": record.timestamp.strftime('%Y-%m-%d'),
+        "status": record.status
+    }
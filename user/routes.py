@@ -1,20 +1,33 @@
-from datetime import datetime
+from datetime import datetime, date
 from functools import wraps
 from flask import (
     Blueprint, render_template, redirect,
-    url_for, request, flash, abort
+    url_for, request, flash, abort,
+    Response, stream_with_context
 )
 from werkzeug.security import generate_password_hash
 from models import (
     User, Student, Lecturer, Admin,
     Department, Course, db, Faculty, Semester,
-    AttendanceRecord, ClassSession, Level
+    ClassSession, Level, format_schedule,
+    ATTENDANCE_STATUSES, normalize_status
 )
 from .forms import (
     AttendanceForm, LoginForm, CreateClassForm
 )
+from .queries import (
+    lecturer_attendance_queries, student_attendance, attendance_summary,
+    paginate_attendance, decode_cursor, serialize_record,
+    student_dashboard_stats, course_roster,
+    enrolled_student_ids, lecturer_session_for_course, attendance_export_queries,
+    attendance_matrix, session_roster
+)
+from .export import iter_csv, iter_xlsx, Workbook
+from .services import mark_attendance_bulk
+from .timetable import timetable
+from database import read_only
+from .passwords import password_verifier, PasswordPoolBusy
 from flask_login import login_user, logout_user, current_user, login_required
-from werkzeug.security import check_password_hash
 
 user_bp = Blueprint('user', __name__, url_prefix='/')
 
@@ -23,17 +36,43 @@ def login():
     login_form = LoginForm()
     print(request.form)
     if login_form.validate_on_submit():
-        student_number = login_form.matric_number.data  # Use student_number instead of matric_number
+        student_number = str(login_form.matric_number.data)  # Use student_number instead of matric_number
         password = login_form.password.data
 
-        # Check Student (using student_number)
-        user = Student.query.filter_by(student_number=student_number).first()
-
-        # If not student, check Lecturer
-        if not user:
-            user = Lecturer.query.filter_by(staff_number=student_number).first()
+        # Student and staff numbers are both indexed in user.login_id. They
+        # are unique per role, so a number can belong to a student and a
+        # lecturer created before the forms checked; the password decides.
+        candidates = User.query.filter_by(login_id=student_number).all()
+
+        # Fall back to the per-role tables for accounts without a login_id
+        if not candidates:
+            candidates = Student.query.filter_by(student_number=student_number).all()
+        if not candidates:
+            candidates = Lecturer.query.filter_by(staff_number=student_number).all()
+
+        try:
+            user = next(
+                (candidate for candidate in candidates
+                 if password_verifier.check(candidate.password, password)),
+                None
+            )
+            valid = user is not None
+        except PasswordPoolBusy:
+            flash("⏳ Too many people are signing in right now, please try again in a few seconds.", "warning")
+            return (
+                render_template("common_view/login.html", login_form=login_form),
+                503,
+                {'Retry-After': str(password_verifier.retry_after)}
+            )
 
-        if user and check_password_hash(user.password, password):
+        if valid:
+            if password_verifier.needs_rehash(user.password):
+                # Upgrade to the configured cost profile; retried next login if busy
+                try:
+                    user.password = password_verifier.hash(password)
+                    db.session.commit()
+                except PasswordPoolBusy:
+                    pass
             login_user(user)
             flash("✅ Login successful", "success")
             if hasattr(user, 'role') and user.role == 'student':
@@ -61,24 +100,26 @@ def dashboard():
     elif current_user.role == 'student':
         user = current_user
 
-        # Get classes for this student's dept & level
+        now = datetime.now()
+
+        # Today's classes for this student's dept & level, plus any whose
+        # free-text time couldn't be read as a schedule
         classes = ClassSession.query.filter_by(
             department_id=user.department_id,
             level_id=user.level_id
-        ).all()
-
-        # Compute attendance stats
-        total_classes = len(classes)
-        attended = AttendanceRecord.query.filter_by(student_id=user.id, status='present').count()
-        missed = AttendanceRecord.query.filter_by(student_id=user.id, status='absent').count()
-        percentage = (attended / total_classes * 100) if total_classes > 0 else 0
+        ).filter(
+            (ClassSession.weekday == now.weekday()) | ClassSession.weekday.is_(None)
+        ).order_by(ClassSession.start_time, ClassSession.id).all()
+        matrix = attendance_matrix([cls.id for cls in classes], [user.id])
 
-        today = datetime.now().strftime("%A, %d %B %Y")
         return render_template('student_view/student_dashboard.html',
                            user=user,
-                           stats={'attended': attended, 'missed': missed, 'percentage': int(percentage)},
+                           stats=student_dashboard_stats(user),
                            classes=classes,
-                           current_date=today)
+                           class_statuses={cls_id: row[user.id] for cls_id, row in matrix.items()},
+                           running=timetable.running(user.department_id, user.level_id, now),
+                           upcoming=timetable.upcoming(user.department_id, user.level_id, now),
+                           current_date=now.strftime("%A, %d %B %Y"))
     return redirect(url_for('user.login'))
 
 
@@ -92,28 +133,27 @@ def mark_attendance():
     form = AttendanceForm()
     form.course_id.choices = [(c.id, c.name) for c in current_user.courses]
 
-    # Always set all students as choices for validation
-    all_students = Student.query.all()
-    form.student_ids.choices = [(s.id, f"{s.name} ({s.student_number})") for s in all_students]
-
     selected_course_id = form.course_id.data or request.form.get('course_id', type=int)
 
+    # The page loads the roster through get_students, so only the submitted
+    # ids need to be valid choices: keep the ones enrolled in the course.
+    submitted_ids = request.form.getlist('student_ids', type=int)
+    form.student_ids.choices = []
+    if selected_course_id and submitted_ids:
+        enrolled = enrolled_student_ids(selected_course_id, submitted_ids)
+        form.student_ids.choices = [(student_id, str(student_id)) for student_id in sorted(enrolled)]
+
     if form.validate_on_submit():
-        selected_course = Course.query.get(form.course_id.data)
         students_selected = form.student_ids.data
-        attendance_status = form.status.data
-
-        for student_id in students_selected:
-            new_record = AttendanceRecord(
-                student_id=student_id,
-                course_id=selected_course.id,
-                lecturer_id=current_user.id,
-                status=attendance_status
-            )
-            db.session.add(new_record)
-        db.session.commit()
+        created = mark_attendance_bulk(
+            current_user.id,
+            form.course_id.data,
+            {student_id: form.status.data for student_id in students_selected}
+        )
 
-        flash(f"✅ Attendance successfully marked for {len(students_selected)} student(s).", "success")
+        flash(f"✅ Attendance successfully marked for {created} student(s).", "success")
+        if created < len(students_selected):
+            flash(f"{len(students_selected) - created} student(s) were already marked today.", "info")
         return redirect(url_for('user.mark_attendance'))
 
     return render_template(
@@ -123,6 +163,66 @@ def mark_attendance():
     )
 
 
+def _is_id(value):
+    """True for a JSON integer; bools are ints in Python but not ids."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+@user_bp.route('/mark-attendance/bulk', methods=['POST'])
+@login_required
+def mark_attendance_bulk_api():
+    """Mark a class in one request with a status per student.
+
+    Expects JSON like ``{"course_id": 1, "class_session_id": 4,
+    "statuses": {"12": "Present", "13": "Absent"}}``. Bad entries are
+    answered with a 400 listing each one and what is wrong with it.
+    """
+    if current_user.role != 'lecturer':
+        abort(403)
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        abort(400)
+    course_id = payload.get('course_id')
+    class_session_id = payload.get('class_session_id')
+    statuses = payload.get('statuses')
+    if not isinstance(statuses, dict) or not statuses:
+        abort(400)
+    if not _is_id(course_id) or (class_session_id is not None and not _is_id(class_session_id)):
+        abort(400)
+    if course_id not in {c.id for c in current_user.courses}:
+        abort(403)
+    if class_session_id is not None and lecturer_session_for_course(
+            class_session_id, course_id, current_user.id) is None:
+        abort(403)
+
+    invalid = {}
+    for student_id, status in statuses.items():
+        try:
+            int(student_id)
+        except ValueError:
+            invalid[student_id] = "Student id must be an integer"
+            continue
+        if not isinstance(status, str) or normalize_status(status) not in ATTENDANCE_STATUSES:
+            invalid[student_id] = f"Status must be one of {', '.join(ATTENDANCE_STATUSES)}"
+    if invalid:
+        return {"error": "Invalid statuses", "invalid": invalid}, 400
+
+    student_ids = {int(student_id): student_id for student_id in statuses}
+    not_enrolled = set(student_ids) - enrolled_student_ids(course_id, set(student_ids))
+    if not_enrolled:
+        return {
+            "error": "Students not enrolled in this course",
+            "invalid": {student_ids[i]: "Not enrolled in this course" for i in sorted(not_enrolled)},
+        }, 400
+
+    created = mark_attendance_bulk(
+        current_user.id, course_id, statuses,
+        class_session_id=class_session_id
+    )
+    return {"created": created, "skipped": len(statuses) - created}
+
+
 @user_bp.route('/student-list')
 @login_required
 def student_list():
@@ -153,27 +253,15 @@ def settings():
 
 @user_bp.route('/attendance-record')
 @login_required
+@read_only
 def attendance_record():
     if current_user.role == 'student':
-        semester_id = request.args.get('semester')
-        course_id = request.args.get('course')
-        date = request.args.get('date')
-
-        query = AttendanceRecord.query.join(
-            Course
-        ).filter(
-            AttendanceRecord.student_id == current_user.id
+        records = student_attendance(
+            current_user.id,
+            semester_id=request.args.get('semester', type=int),
+            course_id=request.args.get('course', type=int),
+            date=request.args.get('date', type=date.fromisoformat),
         )
-        # AttendanceRecord.query.filter_by(student_id=current_user.id)
-        
-        if semester_id:
-            query = query.join(AttendanceRecord.course).filter(Course.semester_id == semester_id)
-        if course_id:
-            query = query.filter_by(course_id=course_id)
-        if date:
-            query = query.filter(db.func.date(AttendanceRecord.timestamp) == date)
-        
-        records = query.order_by(AttendanceRecord.timestamp.desc()).all()
 
         present_count = sum(1 for r in records if r.status == 'Present')
         absent_count = sum(1 for r in records if r.status == 'Absent')
@@ -195,11 +283,14 @@ def attendance_record():
         )
 
     elif current_user.role == 'lecturer':
-        # Could show history of *their own* marked records
-        records = AttendanceRecord.query.filter_by(lecturer_id=current_user.id).order_by(AttendanceRecord.timestamp.desc()).all()
+        # Only the first page is rendered; the filters and "Load more"
+        # go through attendance_record_query below.
+        records, next_cursor = paginate_attendance(lecturer_attendance_queries(current_user.id))
         return render_template(
             "lecturer_view/manage_attendance.html",
             attendance_records=records,
+            next_cursor=next_cursor,
+            summary=attendance_summary(lecturer_attendance_queries(current_user.id)),
             departments=Department.query.all(),
             levels=Level.query.all(),
             courses=Course.query.all()
@@ -207,15 +298,102 @@ def attendance_record():
     
     return redirect(url_for('user.login'))
 
+
+@user_bp.route('/attendance-record/query')
+@login_required
+@read_only
+def attendance_record_query():
+    if current_user.role != 'lecturer':
+        abort(403)
+
+    filters = dict(
+        department_id=request.args.get('department', type=int),
+        level_id=request.args.get('level', type=int),
+        course_id=request.args.get('course', type=int),
+        date=request.args.get('date', type=date.fromisoformat),
+        search=request.args.get('search', '').strip() or None
+    )
+    cursor = request.args.get('cursor')
+    try:
+        before = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        abort(400)
+    records, next_cursor = paginate_attendance(
+        lecturer_attendance_queries(current_user.id, before=before, **filters)
+    )
+
+    return {
+        "records": [serialize_record(r) for r in records],
+        "next_cursor": next_cursor,
+        # The summary doesn't change between pages, only send it with the first one
+        "summary": None if cursor else attendance_summary(lecturer_attendance_queries(current_user.id, **filters))
+    }
+
+@user_bp.route('/attendance-record/export')
+@login_required
+@read_only
+def export_attendance():
+    """Stream attendance as CSV (default) or ``?format=xlsx``.
+
+    Lecturers export the records they marked, admins export everything.
+    Accepts the records page filters plus a ``start``/``end`` date range.
+    """
+    if current_user.role not in ('lecturer', 'admin'):
+        abort(403)
+
+    day = request.args.get('date', type=date.fromisoformat)
+    stmts = attendance_export_queries(
+        lecturer_id=current_user.id if current_user.role == 'lecturer' else None,
+        course_id=request.args.get('course', type=int),
+        department_id=request.args.get('department', type=int),
+        level_id=request.args.get('level', type=int),
+        start=day or request.args.get('start', type=date.fromisoformat),
+        end=day or request.args.get('end', type=date.fromisoformat),
+        search=request.args.get('search', '').strip() or None
+    )
+
+    export_format = request.args.get('format', 'csv')
+    if export_format == 'csv':
+        body, mimetype = iter_csv(stmts), 'text/csv'
+    elif export_format == 'xlsx' and Workbook is not None:
+        body = iter_xlsx(stmts)
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    else:
+        abort(400)
+
+    filename = f"attendance-{datetime.now():%Y%m%d}.{export_format}"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 @user_bp.route('/create-class', methods=['GET', 'POST'])
 @login_required
 def create_class():
     form = CreateClassForm()
     if form.validate_on_submit():
+        semester = form.semester.data
+        clashes = timetable.clashes(
+            form.weekday.data, form.start_time.data, form.end_time.data,
+            form.department.data.id, form.level.data.id,
+            room=form.room.data, semester_id=semester.id if semester else None
+        )
+        if clashes:
+            for slot in clashes:
+                where = f" in {slot.room}" if slot.room else ""
+                flash(f"⚠️ Clashes with {slot.course_code} ({slot.label}{where}).", "danger")
+            return render_template('lecturer_view/create_class.html', form=form)
+
         new_class = ClassSession(
             course_code=form.course_code.data,
             title=form.title.data,
-            time=form.time.data,
+            time=format_schedule(form.weekday.data, form.start_time.data, form.end_time.data),
+            weekday=form.weekday.data,
+            start_time=form.start_time.data,
+            end_time=form.end_time.data,
+            room=(form.room.data or '').strip() or None,
+            semester=semester,
             department=form.department.data,  # This is a Department instance
             level=form.level.data,
             lecturer_id=current_user.id
@@ -227,16 +405,54 @@ def create_class():
     return render_template('lecturer_view/create_class.html',
                            form=form)
 
+@user_bp.route('/class-sessions/attendance')
+@login_required
+@read_only
+def class_session_attendance():
+    """Session x student attendance grid for the lecturer's class sessions.
+
+    Optional repeated `session_id` parameters narrow it to those sessions.
+    """
+    if current_user.role != 'lecturer':
+        abort(403)
+    query = ClassSession.query.filter_by(lecturer_id=current_user.id)
+    session_ids = request.args.getlist('session_id', type=int)
+    if session_ids:
+        query = query.filter(ClassSession.id.in_(session_ids))
+    sessions = query.order_by(ClassSession.created_at, ClassSession.id).all()
+
+    students = session_roster(sessions)
+    matrix = attendance_matrix([s.id for s in sessions], [student_id for student_id, _, _ in students])
+    return {
+        "sessions": [
+            {"id": s.id, "course_code": s.course_code, "title": s.title, "time": s.time}
+            for s in sessions
+        ],
+        "students": [
+            {"id": student_id, "name": name, "student_number": student_number}
+            for student_id, name, student_number in students
+        ],
+        # JSON object keys are strings: {"<session id>": {"<student id>": status or null}}
+        "statuses": matrix
+    }
+
 @user_bp.route('/get-students/<int:course_id>')
 @login_required
 def get_students(course_id):
-    students = Student.query.all()
+    if current_user.role != 'lecturer':
+        abort(403)
+    owns_course = db.session.scalar(
+        db.select(Course.id).where(Course.id == course_id, Course.lecturer_id == current_user.id)
+    )
+    if owns_course is None:
+        abort(404)
+
     student_list = [
         {
-            "id": s.id,  # Use 'id', not 'student_id'
-            "name": s.name,
-            "student_number": s.student_number
+            "id": student_id,  # Use 'id', not 'student_id'
+            "name": name,
+            "student_number": student_number
         }
-        for s in students
+        for student_id, name, student_number in course_roster(course_id)
     ]
     return {"students": student_list}
@@ -0,0 +1,52 @@
+from datetime import datetime
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import (
+    db, AttendanceRecord, Course, ATTENDANCE_STATUSES,
+    normalize_status, update_attendance_summary
+)
+
+
+def mark_attendance_bulk(lecturer_id, course_id, statuses, class_session_id=None, timestamp=None):
+    """Record attendance for a whole class in one transaction.
+
+    `statuses` maps student ids to their status, so one submission can mark
+    some students present and others absent. All rows go out as a single
+    executemany. Students who already have a record for this course and
+    class session on the same day are skipped by the unique index, so a
+    double-submitted form doesn't duplicate rows.
+
+    Returns the number of records created.
+    """
+    timestamp = timestamp or datetime.utcnow()
+    semester_id = db.session.scalar(db.select(Course.semester_id).where(Course.id == course_id))
+    rows = []
+    for student_id, status in statuses.items():
+        status = normalize_status(status)
+        if status not in ATTENDANCE_STATUSES:
+            raise ValueError(f"Unknown attendance status: {status!r}")
+        rows.append({
+            'student_id': int(student_id),
+            'course_id': course_id,
+            'lecturer_id': lecturer_id,
+            'class_session_id': class_session_id,
+            'semester_id': semester_id,
+            'status': status,
+            'timestamp': timestamp
+        })
+    if not rows:
+        return 0
+
+    stmt = sqlite_insert(AttendanceRecord.__table__).on_conflict_do_nothing().returning(
+        AttendanceRecord.student_id, AttendanceRecord.status
+    )
+    created = db.session.execute(stmt, rows).all()
+
+    # Core inserts bypass the ORM flush hook, so feed the summary directly
+    update_attendance_summary(db.session.connection(), [
+        (student_id, course_id, semester_id, status, timestamp, 1)
+        for student_id, status in created
+    ])
+    db.session.commit()
+    return len(created)
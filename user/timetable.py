@@ -0,0 +1,177 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, namedtuple
+from datetime import time as time_of_day
+from itertools import accumulate
+
+from sqlalchemy import event
+
+from models import db, ClassSession, WEEKDAYS
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+
+def week_minute(weekday, clock):
+    """Minutes since Monday 00:00 of `clock` on `weekday` (0 = Monday)."""
+    return weekday * MINUTES_PER_DAY + clock.hour * 60 + clock.minute
+
+
+class Slot(namedtuple('Slot', ['start', 'end', 'session_id', 'course_code', 'title',
+                               'room', 'department_id', 'level_id', 'semester_id'])):
+    """A weekly class session; `start` and `end` are week minutes."""
+    __slots__ = ()
+
+    @property
+    def weekday(self):
+        return self.start // MINUTES_PER_DAY
+
+    @property
+    def start_time(self):
+        return time_of_day(*divmod(self.start % MINUTES_PER_DAY, 60))
+
+    @property
+    def end_time(self):
+        return time_of_day(*divmod(self.end % MINUTES_PER_DAY, 60))
+
+    @property
+    def label(self):
+        return f"{WEEKDAYS[self.weekday]} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+
+class IntervalIndex:
+    """The slots of one department/level or room, sorted by start.
+
+    `max_end[i]` is the latest end among the first i + 1 slots, so an
+    overlap search bisects to the last slot starting before the range and
+    walks left only while an earlier slot can still reach it: O(log n + k)
+    for k overlapping slots in a timetable without pile-ups.
+    """
+
+    def __init__(self, slots):
+        self.slots = sorted(slots)
+        self.starts = [slot.start for slot in self.slots]
+        self.max_end = list(accumulate((slot.end for slot in self.slots), max))
+
+    def overlapping(self, start, end):
+        """Slots running at some point of the week minutes ``[start, end)``, by start."""
+        found = []
+        i = bisect_left(self.starts, end) - 1
+        while i >= 0 and self.max_end[i] > start:
+            if self.slots[i].end > start:
+                found.append(self.slots[i])
+            i -= 1
+        return found[::-1]
+
+    def at(self, minute):
+        return self.overlapping(minute, minute + 1)
+
+    def after(self, minute):
+        """First slot starting after `minute`, wrapping round to next week."""
+        if not self.slots:
+            return None
+        i = bisect_right(self.starts, minute)
+        return self.slots[i] if i < len(self.slots) else self.slots[0]
+
+
+class Timetable:
+    """Weekly timetable of every scheduled class session, held in memory.
+
+    Keeps an `IntervalIndex` per department/level and per room, so the
+    student dashboard's current/next sessions and `create_class`'s clash
+    check need no query. Rebuilt after class sessions are written in this
+    process (see the listeners below) or `ttl` seconds after loading;
+    like `QueryChoices`, a load that overlaps an invalidation isn't kept.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.version = 0
+        self._loaded = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._loaded = None
+
+    def load(self):
+        """Return the ``(groups, rooms)`` index dicts, loading them if needed."""
+        loaded = self._loaded
+        if loaded is not None and (self.ttl is None or loaded[0] > time.monotonic()):
+            return loaded[1], loaded[2]
+
+        version = self.version
+        by_group, by_room = defaultdict(list), defaultdict(list)
+        rows = db.session.execute(
+            db.select(
+                ClassSession.weekday, ClassSession.start_time, ClassSession.end_time,
+                ClassSession.id, ClassSession.course_code, ClassSession.title, ClassSession.room,
+                ClassSession.department_id, ClassSession.level_id, ClassSession.semester_id
+            ).where(
+                ClassSession.weekday.is_not(None),
+                ClassSession.start_time.is_not(None),
+                ClassSession.end_time.is_not(None)
+            )
+        )
+        for weekday, start, end, *details in rows:
+            slot = Slot(week_minute(weekday, start), week_minute(weekday, end), *details)
+            by_group[slot.department_id, slot.level_id].append(slot)
+            if slot.room:
+                by_room[room_key(slot.room)].append(slot)
+        groups = {key: IntervalIndex(slots) for key, slots in by_group.items()}
+        rooms = {key: IntervalIndex(slots) for key, slots in by_room.items()}
+
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if self.version == version:
+                self._loaded = (expires, groups, rooms)
+        return groups, rooms
+
+    def _group(self, department_id, level_id):
+        return self.load()[0].get((department_id, level_id))
+
+    def running(self, department_id, level_id, moment):
+        """Slots of a department/level in progress at the datetime `moment`."""
+        index = self._group(department_id, level_id)
+        return index.at(week_minute(moment.weekday(), moment)) if index else []
+
+    def upcoming(self, department_id, level_id, moment):
+        """Next slot of a department/level to start after `moment`, or None."""
+        index = self._group(department_id, level_id)
+        return index.after(week_minute(moment.weekday(), moment)) if index else None
+
+    def clashes(self, weekday, start, end, department_id, level_id, room=None,
+                semester_id=None, exclude=None):
+        """Slots overlapping a proposed session in its department/level or room.
+
+        Sessions of a different semester don't clash; ones without a
+        semester clash with every semester. `exclude` skips a session id,
+        for rescheduling.
+        """
+        groups, rooms = self.load()
+        indexes = [groups.get((department_id, level_id))]
+        if room:
+            indexes.append(rooms.get(room_key(room)))
+        begin, finish = week_minute(weekday, start), week_minute(weekday, end)
+
+        found = {}
+        for index in filter(None, indexes):
+            for slot in index.overlapping(begin, finish):
+                if slot.session_id == exclude:
+                    continue
+                if semester_id and slot.semester_id and slot.semester_id != semester_id:
+                    continue
+                found[slot.session_id] = slot
+        return sorted(found.values())
+
+
+def room_key(room):
+    return ' '.join(room.split()).casefold()
+
+
+timetable = Timetable()
+
+for _name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(ClassSession, _name, lambda mapper, connection, target: timetable.invalidate())
@@ -1,6 +1,8 @@
 """Useful form fields for use with SQLAlchemy ORM."""
 
 import operator
+import threading
+import time
 from collections import defaultdict
 
 from wtforms import widgets
@@ -8,6 +10,7 @@ from wtforms.fields import SelectFieldBase
 from wtforms.validators import ValidationError
 
 try:
+    from sqlalchemy import inspect as sa_inspect
     from sqlalchemy.orm.util import identity_key
 
     has_identity_key = True
@@ -16,6 +19,7 @@ except ImportError:
 
 
 __all__ = (
+    "QueryChoices",
     "QuerySelectField",
     "QuerySelectMultipleField",
     "QueryRadioField",
@@ -23,6 +27,56 @@ __all__ = (
 )
 
 
+class QueryChoices:
+    """Caches the choices of query select fields between requests.
+
+    Pass an instance as the `query_factory` of a `QuerySelectField` or
+    `QuerySelectMultipleField`. `query_factory` is then only called when the
+    cache is empty: its results are kept as ``(pk, obj)`` pairs together with
+    a pk index until `invalidate` is called (typically from model change
+    events) or, if set, `ttl` seconds have passed. Each invalidation bumps
+    `version`, and a load that overlaps an invalidation is not kept.
+
+    The cached objects are shared by every request, so `query_factory`
+    should return objects that are not tied to a request's session. The
+    object a field hands out as its data goes through `get_object`, which
+    can attach it to the current session; by default it is the cached
+    object itself.
+    """
+
+    def __init__(self, query_factory, get_pk=None, get_object=None, ttl=None):
+        self.query_factory = query_factory
+        self.get_pk = get_pk or get_pk_from_identity
+        self.get_object = get_object or (lambda obj: obj)
+        self.ttl = ttl
+        self.version = 0
+        self._loaded = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._loaded = None
+
+    def load(self):
+        """Return the cached ``(pk, obj)`` list and pk index, loading them if needed."""
+        loaded = self._loaded
+        if loaded is not None and (self.ttl is None or loaded[0] > time.monotonic()):
+            return loaded[1], loaded[2]
+
+        version = self.version
+        object_list = [(str(self.get_pk(obj)), obj) for obj in self.query_factory()]
+        pk_index = dict(object_list)
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if self.version == version:
+                self._loaded = (expires, object_list, pk_index)
+        return object_list, pk_index
+
+    def __call__(self):
+        return [obj for _, obj in self.load()[0]]
+
+
 class QuerySelectField(SelectFieldBase):
     """Will display a select drop-down field to choose between ORM results in a
     sqlalchemy `Query`.  The `data` property actually will store/keep an ORM
@@ -39,7 +93,8 @@ class QuerySelectField(SelectFieldBase):
     The `query` property on the field can be set from within a view to assign
     a query per-instance to the field. If the property is not set, the
     `query_factory` callable passed to the field constructor will be called to
-    obtain a query.
+    obtain a query. `query_factory` can also be a `QueryChoices`, which keeps
+    the choices cached between requests.
 
     Specify `get_label` to customize the label associated with each option. If
     a string, this is the name of an attribute on the model object to use as
@@ -125,13 +180,13 @@ class QuerySelectField(SelectFieldBase):
         self.blank_value = blank_value
         self.query = None
         self._object_list = None
+        self._pk_index = None
 
     def _get_data(self):
         if self._formdata is not None:
-            for pk, obj in self._get_object_list():
-                if pk == self._formdata:
-                    self._set_data(obj)
-                    break
+            obj = self._get_pk_index().get(self._formdata)
+            if obj is not None:
+                self._set_data(self._resolve(obj))
         return self._data
 
     def _set_data(self, data):
@@ -140,19 +195,46 @@ class QuerySelectField(SelectFieldBase):
 
     data = property(_get_data, _set_data)
 
+    def _choice_provider(self):
+        if self.query is None and isinstance(self.query_factory, QueryChoices):
+            return self.query_factory
+        return None
+
     def _get_object_list(self):
         if self._object_list is None:
-            query = self.query if self.query is not None else self.query_factory()
-            get_pk = self.get_pk
-            self._object_list = list((str(get_pk(obj)), obj) for obj in query)
+            provider = self._choice_provider()
+            if provider is not None:
+                self._object_list, self._pk_index = provider.load()
+            else:
+                query = self.query if self.query is not None else self.query_factory()
+                get_pk = self.get_pk
+                self._object_list = list((str(get_pk(obj)), obj) for obj in query)
         return self._object_list
 
+    def _get_pk_index(self):
+        if self._pk_index is None:
+            self._pk_index = dict(self._get_object_list())
+        return self._pk_index
+
+    def _resolve(self, obj):
+        provider = self._choice_provider()
+        return provider.get_object(obj) if provider is not None else obj
+
+    def _pk_of(self, obj):
+        provider = self._choice_provider()
+        return str((provider or self).get_pk(obj))
+
+    def _data_pk(self):
+        data = self.data
+        return None if data is None else self._pk_of(data)
+
     def iter_choices(self):
         if self.allow_blank:
             yield (self.blank_value, self.blank_text, self.data is None, {})
 
+        selected = self._data_pk()
         for pk, obj in self._get_object_list():
-            yield (pk, self.get_label(obj), obj == self.data, self.get_render_kw(obj))
+            yield (pk, self.get_label(obj), pk == selected, self.get_render_kw(obj))
 
     def has_groups(self):
         return self._has_groups
@@ -171,8 +253,9 @@ class QuerySelectField(SelectFieldBase):
         else:
             _choices = choices
 
+        selected = self._data_pk()
         for pk, obj in _choices:
-            yield (pk, self.get_label(obj), obj == self.data, self.get_render_kw(obj))
+            yield (pk, self.get_label(obj), pk == selected, self.get_render_kw(obj))
 
     def process_formdata(self, valuelist):
         if valuelist:
@@ -185,10 +268,7 @@ class QuerySelectField(SelectFieldBase):
     def pre_validate(self, form):
         data = self.data
         if data is not None:
-            for _, obj in self._get_object_list():
-                if data == obj:
-                    break
-            else:
+            if self._pk_of(data) not in self._get_pk_index():
                 raise ValidationError(self.gettext("Not a valid choice"))
         elif self._formdata or not self.allow_blank:
             raise ValidationError(self.gettext("Not a valid choice"))
@@ -201,14 +281,25 @@ class QuerySelectMultipleField(QuerySelectField):
 
     If any of the items in the data list or submitted form data cannot
     be found in the query, this will result in a validation error.
+    Submitted values are resolved through a pk index, so validation is
+    linear in the number of choices plus the number submitted; `data` keeps
+    the submitted order.
+
+    With `lazy=True` submitted values are resolved with a single ``IN``
+    query for just those primary keys instead of loading every choice.
+    The query must then be a `Query` for a model with a single-column
+    primary key that can still be filtered; the full list is only loaded if
+    the field is rendered.
     """
 
     widget = widgets.Select(multiple=True)
 
-    def __init__(self, label=None, validators=None, default=None, **kwargs):
+    def __init__(self, label=None, validators=None, default=None, lazy=False, **kwargs):
         if default is None:
             default = []
         super().__init__(label, validators, default=default, **kwargs)
+        self.lazy = lazy
+        self._lazy_index = {}
         if kwargs.get("allow_blank", False):
             import warnings
 
@@ -221,16 +312,10 @@ class QuerySelectMultipleField(QuerySelectField):
     def _get_data(self):
         formdata = self._formdata
         if formdata is not None:
-            data = []
-            for pk, obj in self._get_object_list():
-                if not formdata:
-                    break
-                elif pk in formdata:
-                    formdata.remove(pk)
-                    data.append(obj)
-            if formdata:
+            found = self._lookup(formdata)
+            if len(found) < len(formdata):
                 self._invalid_formdata = True
-            self._set_data(data)
+            self._set_data([self._resolve(obj) for obj in found.values()])
         return self._data
 
     def _set_data(self, data):
@@ -240,20 +325,55 @@ class QuerySelectMultipleField(QuerySelectField):
     data = property(_get_data, _set_data)
 
     def iter_choices(self):
+        selected = {self._pk_of(obj) for obj in self.data}
         for pk, obj in self._get_object_list():
-            yield (pk, self.get_label(obj), obj in self.data, self.get_render_kw(obj))
+            yield (pk, self.get_label(obj), pk in selected, self.get_render_kw(obj))
 
     def process_formdata(self, valuelist):
-        self._formdata = set(valuelist)
+        self._formdata = dict.fromkeys(valuelist)
 
     def pre_validate(self, form):
+        # Resolving the submitted values is what flags invalid ones
+        data = self.data
         if self._invalid_formdata:
             raise ValidationError(self.gettext("Not a valid choice"))
-        elif self.data:
-            obj_list = list(x[1] for x in self._get_object_list())
-            for v in self.data:
-                if v not in obj_list:
-                    raise ValidationError(self.gettext("Not a valid choice"))
+        elif data:
+            pks = {self._pk_of(v) for v in data}
+            if len(self._lookup(pks)) < len(pks):
+                raise ValidationError(self.gettext("Not a valid choice"))
+
+    def _lookup(self, pks):
+        """Map each of `pks` that is a valid choice to its object."""
+        if self.lazy and self._choice_provider() is None:
+            missing = [pk for pk in pks if pk not in self._lazy_index]
+            if missing:
+                self._lazy_index.update(self._query_pks(missing))
+            index = self._lazy_index
+        else:
+            index = self._get_pk_index()
+        return {pk: index[pk] for pk in pks if pk in index}
+
+    def _query_pks(self, pks):
+        query = self.query if self.query is not None else self.query_factory()
+        entity = query.column_descriptions[0]["entity"]
+        pk_columns = sa_inspect(entity).primary_key
+        if len(pk_columns) != 1:
+            raise TypeError("lazy=True needs a model with a single-column primary key")
+        column = pk_columns[0]
+
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            python_type = str
+        values = []
+        for pk in pks:
+            try:
+                values.append(python_type(pk))
+            except (TypeError, ValueError):
+                continue
+
+        get_pk = self.get_pk
+        return {str(get_pk(obj)): obj for obj in query.filter(column.in_(values))}
 
 
 class QueryRadioField(QuerySelectField):